@@ -0,0 +1,338 @@
+# benchmark.py
+# ベンチマーク: 合成したノード・エッジcsvで、読み込みから地図の描画までの各段階の時間・モデルの大きさ・メモリを計測する
+# 結果はjsonのレポートに書き出し、別のコミットで書き出したレポートと比べられる
+#
+# 使い方:
+#   python benchmark.py [--shipyards 6] [--ports 2] [--areas 2] [--periods 12,36] [--density 0.5] [--out report.json]
+#   python benchmark.py --periods 12,36 --compare report.json   （前回のレポートとの比較を表示）
+# 合成したネットワークは密度によっては解きにくいので、求解は制限時間（既定60秒）で打ち切る（statusがtimelimitになり、gapを記録する）
+#
+# --shipyards / --ports / --areas / --periods / --density はカンマ区切りで複数指定でき、全ての組み合わせを計測する
+# 段階:
+#   parse    csvの読み込み・チェック（read_network）
+#   network  ネットワークの作成・計算用の値の設定（build_network, set_calc_parameters）
+#   model    変数・制約の追加（create_model）
+#   presolve SCIPのpresolve
+#   solve    SCIPの求解（presolveの後）
+#   extract  結果表の作成（result_table）
+#   maps     月ごとのネットワーク図の作成（map_graphs）
+#   render   全ての月の地図の描画（render_map）
+# 各段階の後のモデルの変数・制約の数（presolveの後は変換後の数）、プロセスの最大メモリ使用量、SCIPのメモリ使用量を記録する
+# ケースごとに新しいプロセスで計測する（最大メモリ使用量がケースをまたがないように）
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pyscipopt
+
+from calc import build_network, create_model, make_horizon, map_graphs, render_map, result_table, set_calc_parameters
+from scenario import format_table
+from schema import edge_schema, node_schema, read_network
+
+try:
+    import resource
+except ImportError:
+    # Windowsにはないので、最大メモリ使用量は記録しない
+    resource = None
+
+# 計画期間の開始（sample.pyの既定と同じ2025年11月から）
+start_year, start_month = 2025, 11
+# 段階の順
+stage_names = ["parse", "network", "model", "presolve", "solve", "extract", "maps", "render"]
+
+# 造船所の種類ごとの設定（sample用のnode.csvの値）、造船所は 大型 → 中型 → 小型 の順に繰り返す
+# task: {機能: (コスト, キャパシティ)}
+shipyard_templates = [
+    {"kind": "大型造船所", "storage": None, "offshore": None,
+     "task": {"モジュール製作": (91666666, 1), "ハーフボディ1製作": (91666666, 1), "ハーフボディ3製作": (275000000, 1), "浮体基礎製作": (366666666, 1)}},
+    {"kind": "中型造船所", "storage": (36666666, 6), "offshore": (440000000, 0.75),
+     "task": {"モジュール製作": (91666666, 0.75), "ハーフボディ1製作": (91666666, 0.75), "ハーフボディ3製作": (275000000, 0.75)}},
+    {"kind": "小型造船所", "storage": None, "offshore": None,
+     "task": {"モジュール製作": (91666666, 0.25), "ハーフボディ1製作": (91666666, 0.25)}},
+]
+# 1期間あたりの浮体基礎の製作数のうち、風車の需要にする割合（需要を満たせる大きさにする）
+demand_ratio = 0.5
+
+
+# 2点間の距離[km]（大圏距離の1.3倍を航路の距離とする）
+def sea_distance(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return max(1, round(1.3 * 2 * 6371 * math.asin(math.sqrt(h))))
+
+
+# 合成したノード・エッジcsv（読み込み済みの行、List[List[str]]）を返す
+# shipyards: 造船所の数、ports: 基地港湾の数、areas: 設置海域の数、periods: 計画期間の数
+# densityは必須のエッジ以外を追加する割合（0〜1）、同じ引数からは常に同じcsvになる
+# 必須のエッジ: 各造船所 → 最寄りの基地港湾、中型・小型造船所 → 最寄りの大型造船所、最寄りの基地港湾 → 各設置海域
+def generate_network(shipyards, ports, areas, periods, density=0.5, seed=0):
+    if shipyards < 1 or ports < 1 or areas < 1:
+        raise ValueError("造船所・基地港湾・設置海域はそれぞれ1以上を指定してください")
+    if not 0 <= density <= 1:
+        raise ValueError(f"densityは0以上1以下を指定してください: {density}")
+    rng = random.Random(seed)
+    horizon = make_horizon(start_year, start_month, periods)
+
+    def place():
+        return round(rng.uniform(31, 41), 6), round(rng.uniform(129, 142), 6)
+
+    # ノード: 項目 → 値（ないものは空欄）
+    nodes = []
+    templates = [shipyard_templates[index % len(shipyard_templates)] for index in range(shipyards)]
+    for index, template in enumerate(templates):
+        lat, lon = place()
+        node = {"name": f"造船所{index + 1}", "lat": lat, "lon": lon, "kind": template["kind"], "steel": 99}
+        if template["storage"]:
+            node.update(storage="TRUE", storage_cost=template["storage"][0], storage_capacity=template["storage"][1])
+        if template["offshore"]:
+            node.update({"offshore_foundation": "TRUE", "洋上での浮体基礎製作コスト": template["offshore"][0], "洋上での浮体基礎製作キャパシティ": template["offshore"][1]})
+        for task, (cost, capacity) in template["task"].items():
+            # コストは±10%でばらつかせる（目的関数の係数は整数のほうがSCIPが速く解けるので円単位）
+            node[f"{task}コスト"] = round(cost * rng.uniform(0.9, 1.1))
+            node[f"{task}キャパシティ"] = capacity
+        nodes.append(node)
+    for index in range(ports):
+        lat, lon = place()
+        nodes.append({"name": f"基地港湾{index + 1}", "lat": lat, "lon": lon, "kind": "基地港湾", "storage": "TRUE", "storage_cost": 36666666, "storage_capacity": 6,
+                      "風車組立コスト": round(70448000 * rng.uniform(0.9, 1.1)), "風車組立キャパシティ": 5})
+
+    # 風車の需要: 全造船所の浮体基礎の製作数 × 期間数 × demand_ratio を設置海域に割り振る
+    foundations = sum(template["task"].get("浮体基礎製作", (0, 0))[1] + (template["offshore"] or (0, 0))[1] for template in templates)
+    demand = max(areas, int(foundations * periods * demand_ratio))
+    # 設置を開始できる月は計画期間の最初の3期間のどれか
+    start_months = [period.split("年")[-1][:-1] for period in horizon[:3]]
+    for index in range(areas):
+        lat, lon = place()
+        nodes.append({"name": f"設置海域{index + 1}", "lat": lat, "lon": lon, "kind": "設置海域",
+                      "風車設置コスト": 17361000, "風車設置キャパシティ": 5,
+                      "turbine": demand // areas + (1 if index < demand % areas else 0), "install_start": rng.choice(start_months)})
+
+    # エッジ: (流出元, 流出先) の集合
+    position = {node["name"]: (node["lat"], node["lon"]) for node in nodes}
+    yard_names = [node["name"] for node in nodes if node["kind"].endswith("造船所")]
+    large_names = [node["name"] for node in nodes if node["kind"] == "大型造船所"]
+    port_names = [node["name"] for node in nodes if node["kind"] == "基地港湾"]
+    area_names = [node["name"] for node in nodes if node["kind"] == "設置海域"]
+
+    def nearest(name, candidates):
+        return min((candidate for candidate in candidates if candidate != name), key=lambda candidate: sea_distance(position[name], position[candidate]), default=None)
+
+    edges = set()
+    for name in yard_names:
+        edges.add((name, nearest(name, port_names)))
+        if name not in large_names and nearest(name, large_names):
+            edges.add((name, nearest(name, large_names)))
+    for name in area_names:
+        edges.add((nearest(name, port_names), name))
+    candidates = [(a, b) for a in yard_names for b in yard_names + port_names if a != b] + [(a, b) for a in port_names for b in area_names]
+    edges.update(edge for edge in candidates if rng.random() < density)
+
+    node_columns = {key: column for key, column, _, _ in node_schema}
+    node_rows = [list(node_columns.values())]
+    node_rows += [["" if node.get(key) is None else str(node[key]) for key in node_columns] for node in nodes]
+    edge_rows = [[column for _, column, _, _ in edge_schema]]
+    edge_rows += [[source, target, str(sea_distance(position[source], position[target])), "100"] for source, target in sorted(edges)]
+    return node_rows, edge_rows
+
+
+# プロセスの最大メモリ使用量[MB]（記録できない場合はNone）
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+# 1ケース分を計測（ワーカープロセスで実行）
+# 結果: {"name", "config", "status", "objective", "nodes", "edges", "stages": {段階: {"time", ...}}}
+def run_case(config, builder="object", mode="exact", time_limit=None, trace_memory=False):
+    node_rows, edge_rows = generate_network(config["shipyards"], config["ports"], config["areas"], config["periods"], config["density"], config["seed"])
+    horizon = make_horizon(start_year, start_month, config["periods"])
+    result = {"name": case_name(config), "config": config, "status": None, "objective": None,
+              "nodes": len(node_rows) - 1, "edges": len(edge_rows) - 1, "stages": {}}
+    model = None
+    if trace_memory:
+        tracemalloc.start()
+
+    # 段階ごとに時間・メモリ・モデルの大きさを記録
+    def record(name, start):
+        stage = {"time": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}
+        if trace_memory:
+            stage["python_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.reset_peak()
+        if model is not None:
+            stage.update(vars=model.getNVars(), conss=model.getNConss(), scip_mem_mb=model.getMemUsed() / 2 ** 20)
+        result["stages"][name] = stage
+
+    start = time.perf_counter()
+    records = read_network(node_rows, edge_rows, horizon)
+    record("parse", start)
+
+    start = time.perf_counter()
+    node_list, transportation_list, production_list, storage_list = build_network(node_rows, edge_rows, horizon, records)
+    set_calc_parameters(node_list, transportation_list, production_list, storage_list)
+    record("network", start)
+
+    start = time.perf_counter()
+    model = create_model(node_list, transportation_list, production_list, storage_list, builder, mode, {"limits/time": time_limit} if time_limit else None)
+    record("model", start)
+
+    start = time.perf_counter()
+    model.presolve()
+    record("presolve", start)
+
+    start = time.perf_counter()
+    model.optimize()
+    record("solve", start)
+    result["status"] = model.getStatus()
+    result["stages"]["solve"]["bb_nodes"] = model.getNNodes()
+
+    if model.getNSols() > 0:
+        result["objective"] = model.getObjVal()
+        result["gap"] = model.getGap()
+        start = time.perf_counter()
+        table = result_table(model, transportation_list, production_list, storage_list)
+        record("extract", start)
+
+        start = time.perf_counter()
+        graphs = map_graphs(node_list, table)
+        record("maps", start)
+
+        start = time.perf_counter()
+        for G in graphs.values():
+            render_map(G)
+        record("render", start)
+    if trace_memory:
+        tracemalloc.stop()
+    return result
+
+
+def case_name(config):
+    return f"N{config['shipyards']}_M{config['ports']}_K{config['areas']}_T{config['periods']}_d{config['density']:g}"
+
+
+# 計測しているコミット（gitがない場合はNone）
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 全ケースを計測してレポート（辞書）を返す
+# repeat回計測した場合、各段階の時間は最小値（timesに全ての回の時間）、それ以外は1回目の値
+def run_benchmark(configs, builder="object", mode="exact", time_limit=None, repeat=1, trace_memory=False):
+    context = multiprocessing.get_context("spawn")
+    cases = []
+    for config in configs:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_case, config, builder, mode, time_limit, trace_memory).result())
+        case = runs[0]
+        for name, stage in case["stages"].items():
+            stage["times"] = [run["stages"][name]["time"] for run in runs if name in run["stages"]]
+            stage["time"] = min(stage["times"])
+        case["total_time"] = sum(stage["time"] for stage in case["stages"].values())
+        print(f"{case['name']}: {case['status']} {case['total_time']:.2f}秒", file=sys.stderr)
+        cases.append(case)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "pyscipopt": pyscipopt.__version__,
+            "scip": f"{pyscipopt.Model.getMajorVersion(None)}.{pyscipopt.Model.getMinorVersion(None)}.{pyscipopt.Model.getTechVersion(None)}",
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "options": {"builder": builder, "mode": mode, "time_limit": time_limit, "repeat": repeat},
+        "cases": cases
+    }
+
+
+# レポートの各ケース × 段階の表（baseを指定した場合は前回の時間と比）
+def report_table(report, base=None):
+    base_cases = {case["name"]: case for case in base["cases"]} if base else {}
+    rows = []
+    for case in report["cases"]:
+        base_case = base_cases.get(case["name"], {"stages": {}})
+        for name in stage_names + ["total"]:
+            stage = {"time": case["total_time"]} if name == "total" else case["stages"].get(name)
+            if stage is None:
+                continue
+            row = {"case": case["name"], "stage": name, "status": case["status"], "stage_time": stage["time"],
+                   "vars": stage.get("vars"), "conss": stage.get("conss"), "peak_rss_mb": stage.get("peak_rss_mb")}
+            base_time = base_case.get("total_time") if name == "total" else base_case["stages"].get(name, {}).get("time")
+            if base_time is not None:
+                row["base_time"] = base_time
+                row["ratio"] = f"{stage['time'] / base_time:.2f}x" if base_time > 0 else ""
+            rows.append(row)
+    columns = ["case", "stage", "status", "stage_time", "vars", "conss", "peak_rss_mb"]
+    if base:
+        columns += ["base_time", "ratio"]
+    return format_table(rows, columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマーク（合成したcsvで各段階の時間・モデルの大きさ・メモリを計測）")
+    parser.add_argument("--shipyards", default="6", help="造船所の数（カンマ区切り）")
+    parser.add_argument("--ports", default="2", help="基地港湾の数（カンマ区切り）")
+    parser.add_argument("--areas", default="2", help="設置海域の数（カンマ区切り）")
+    parser.add_argument("--periods", default="12,36", help="計画期間の数（カンマ区切り）")
+    parser.add_argument("--density", default="0.5", help="必須以外のエッジを追加する割合（カンマ区切り）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--builder", default="object", choices=["object", "matrix"])
+    parser.add_argument("--mode", default="exact", choices=["exact", "preview"], help="exact: 整数で厳密に解く、preview: LP緩和")
+    parser.add_argument("--time-limit", type=float, default=60, help="1ケースあたりのSCIPの制限時間[秒]（0で制限なし）")
+    parser.add_argument("--repeat", type=int, default=1, help="各ケースの計測回数（時間は最小値）")
+    parser.add_argument("--trace-memory", action="store_true", help="段階ごとのPythonのメモリ使用量も記録する（tracemallocを使うので遅くなる）")
+    parser.add_argument("--out", help="レポートを書き出すjsonファイル")
+    parser.add_argument("--compare", help="比べるレポートのjsonファイル（別のコミットで書き出したもの）")
+    parser.add_argument("--write-csv", help="合成したcsvを書き出すディレクトリ（計測はしない）")
+    args = parser.parse_args(argv)
+
+    configs = [{"shipyards": shipyards, "ports": ports, "areas": areas, "periods": periods, "density": density, "seed": args.seed}
+               for shipyards, ports, areas, periods, density in itertools.product(
+                   [int(value) for value in args.shipyards.split(",")], [int(value) for value in args.ports.split(",")],
+                   [int(value) for value in args.areas.split(",")], [int(value) for value in args.periods.split(",")],
+                   [float(value) for value in args.density.split(",")])]
+
+    if args.write_csv:
+        os.makedirs(args.write_csv, exist_ok=True)
+        for config in configs:
+            node_rows, edge_rows = generate_network(config["shipyards"], config["ports"], config["areas"], config["periods"], config["density"], config["seed"])
+            for label, rows in (("node", node_rows), ("edge", edge_rows)):
+                path = os.path.join(args.write_csv, f"{label}_{case_name(config)}.csv")
+                with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                    csv.writer(f).writerows(rows)
+                print(f"書き出しました: {path}")
+        return 0
+
+    report = run_benchmark(configs, builder=args.builder, mode=args.mode, time_limit=args.time_limit, repeat=args.repeat, trace_memory=args.trace_memory)
+    base = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+    print(report_table(report, base))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# cache.py
+# 計算結果のディスクキャッシュ
+# キーはノード・エッジcsv（空白・空行・改行コードを正規化）と計算設定のハッシュ
+# 上限サイズを超えたら最後に使われた時刻（ファイルの更新時刻）が古いものから削除する
+import csv
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+
+# 保存先と上限サイズ（環境変数で変更可能）
+CACHE_DIR = os.environ.get('SOLVE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.solve_cache'))
+CACHE_MAX_BYTES = int(os.environ.get('SOLVE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+
+# csvの正規化（各セルの前後の空白、行末の空セル、空行を除く）
+def normalize_rows(text):
+    rows = []
+    for row in csv.reader(io.StringIO(text)):
+        row = [cell.strip() for cell in row]
+        while row and not row[-1]:
+            row.pop()
+        if row:
+            rows.append(row)
+    return rows
+
+
+# キャッシュのキー
+def cache_key(node_text, edge_text, settings):
+    payload = json.dumps([normalize_rows(node_text), normalize_rows(edge_text), settings], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f'{key}.pkl')
+
+
+# キャッシュから読み出し（ない場合・壊れている場合はNone）
+def load(key):
+    path = cache_path(key)
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        # 壊れたファイルは削除して計算し直す
+        remove(path)
+        return None
+    # 使われた時刻を更新（LRU）
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+
+# キャッシュに保存（書き込み途中のファイルを読まないように一時ファイルから置き換える）
+def store(key, value):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path(key))
+    except BaseException:
+        remove(tmp_path)
+        raise
+    evict()
+
+
+# 上限サイズに収まるまで古いものから削除
+def evict():
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.pkl'):
+            try:
+                stat = os.stat(os.path.join(CACHE_DIR, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        remove(os.path.join(CACHE_DIR, name))
+        total -= size
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,15 +1,33 @@
 # calc.py
+import copy
 import math
-from pyscipopt import Model, quicksum
+import os
+import tempfile
+import time
+import numpy as np
+from pyscipopt import Model, quicksum, Eventhdlr, SCIP_EVENTTYPE, SCIP_STAGE
 import networkx as nx
 import folium
 from folium.features import Tooltip
-import csv
+from schema import iter_rows, read_network
 
 # 設定ファイル
+# 既定の計画期間（optimizeにhorizonを渡さない場合）
 layer_network_list = ["11月", "12月", "1月", "2月", "3月", "4月", "5月", "6月", "7月", "8月", "9月", "10月"]
+# 設置海域をまとめたノードの月（値には意味なし）
+aggregate_month = "10000月"
 num_product_list = ['鋼材','モジュール', 'ハーフボディ1', 'ハーフボディ3', '浮体基礎', '風車', '風車（設置済）','船舶']
 sign = ['plus', 'minus']
+# 部材・符号 → 番号
+product_index = {product_id: index for index, product_id in enumerate(num_product_list)}
+sign_index = {sign_id: index for index, sign_id in enumerate(sign)}
+# 符号の番号
+PLUS, MINUS = sign_index["plus"], sign_index["minus"]
+# 部材 × 符号 の位置（ProductValues・FlowVarsのリストの並び）
+def slot_of(product, sign_code):
+    return product * len(sign) + sign_code
+# ProductValuesの未設定の値
+_unset = object()
 
 # 基地港湾 → 設置海域の傭船料
 # 1日あたり
@@ -20,8 +38,170 @@ ship_foundation_cost = 2 * 1487000 # 2隻分
 # 燃料コスト 往復・1kmあたり燃料費・ポンド換算
 ship_fuel_cost = 2 * 333 * 198 # 2隻分,1kmあたり
 
+# 感度分析で変えられる船舶の単価（傭船料のみ）
+# 輸送コストの燃料の項は距離[km]そのもの（ship_fuel_costは使っていない）で傭船料に比べて無視できるほど小さいので、倍率を変えても意味がないため含めない
+ship_rate_names = ["ship_installation_cost", "ship_foundation_cost"]
+
+# 部材1個あたりに必要な船舶の数（1隻で運べる部材の数の逆数）
+ship_load = {"鋼材": 1, "モジュール": 1/12, "ハーフボディ1": 1/10, "ハーフボディ3": 2/5, "浮体基礎": 1/2, "風車": 1}
+# 上の表を部材の番号にしたもの（船舶の番号と (部材の番号, 数) のリスト）
+SHIP = product_index["船舶"]
+ship_load_codes = [(product_index[product_id], ratio) for product_id, ratio in ship_load.items()]
+
+# 製作機能ごとのレシピ: (製作される部材, {投入される部材: 製作される部材1個あたりの数})
+# 製作エッジの変数・キャパシティ・B行列の制約はすべてこの表から作る（機能・部材を追加する場合はここに1行追加する）
+# コストは製作される部材にかかり、キャパシティは製作される部材の数（投入される部材はその数倍）
+recipes = {
+    "モジュール製作": ("モジュール", {"鋼材": 1}),
+    "ハーフボディ1製作": ("ハーフボディ1", {"モジュール": 1}),
+    "ハーフボディ3製作": ("ハーフボディ3", {"モジュール": 3}),
+    "浮体基礎製作": ("浮体基礎", {"ハーフボディ1": 1, "ハーフボディ3": 1}),
+    "洋上での浮体基礎製作": ("浮体基礎", {"ハーフボディ1": 1, "ハーフボディ3": 1}),
+    "風車組立": ("風車", {"浮体基礎": 1}),
+    "風車設置": ("風車（設置済）", {"風車": 1}),
+}
+# 製作機能 → 番号（製作エッジのfunction_code、製作機能ごとの表の並び）
+function_list = list(recipes)
+function_index = {function: index for index, function in enumerate(function_list)}
+# 製作機能 → 製作される部材（コストもこの部材にかかる）
+cost_mapping = {function: output for function, (output, inputs) in recipes.items()}
+# 製作機能 → {(部材, plus/minus): キャパシティの倍率}、この組だけ変数を作成する
+production_compatibility = {
+    function: {**{(product_id, "plus"): ratio for product_id, ratio in inputs.items()}, (output, "minus"): 1}
+    for function, (output, inputs) in recipes.items()
+}
+# 製作機能ごとのB行列（行: 投入される部材ごとの変換式、列: (部材, plus/minus)、各行 = 0 の等式）
+# 投入される部材のplusのフロー = 数 × 製作される部材のminusのフロー
+bom_rows = {
+    function: [{(product_id, "plus"): 1, (output, "minus"): -ratio} for product_id, ratio in inputs.items()]
+    for function, (output, inputs) in recipes.items()
+}
+# 仮置エッジは浮体基礎のみ扱う
+storage_compatibility = [("浮体基礎", "plus"), ("浮体基礎", "minus")]
+# 上の組を部材 × 符号 の位置にしたもの（製作機能はfunction_codeの順のリスト）
+production_slots = [{slot_of(product_index[product_id], sign_index[sign_id]) for product_id, sign_id in production_compatibility[function]} for function in function_list]
+# 製作機能ごとのB行列の行を {部材 × 符号 の位置: 係数} にしたもの（function_codeの順のリスト）
+bom_slot_rows = [[{slot_of(product_index[product_id], sign_index[sign_id]): coefficient for (product_id, sign_id), coefficient in row.items()} for row in bom_rows[function]] for function in function_list]
+storage_slots = {slot_of(product_index[product_id], sign_index[sign_id]) for product_id, sign_id in storage_compatibility}
+
+
+# 部材（と符号）ごとの計算用の値（ノード・エッジ1つ分）
+# キーを持たず、部材（・符号）の番号の位置に値を入れた固定長のリストで持つ
+# 部材（・符号）のキーのほか、従来の (…, 部材) / (…, 部材, 符号) のタプルのキーでも読み書きできる（キーの先頭のid・機能は使わない）
+class ProductValues:
+    __slots__ = ("signed", "values")
+
+    def __init__(self, signed=False):
+        # Trueの場合はキーの最後が (部材, 符号)
+        self.signed = signed
+        self.values = [_unset] * (len(num_product_list) * len(sign) if signed else len(num_product_list))
+
+    # キーは 部材 / (…, 部材)、signedの場合は (…, 部材, 符号)
+    def position(self, key):
+        if self.signed:
+            return slot_of(product_index[key[-2]], sign_index[key[-1]])
+        return product_index[key] if isinstance(key, str) else product_index[key[-1]]
+
+    def __getitem__(self, key):
+        value = self.values[self.position(key)]
+        if value is _unset:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.values[self.position(key)] = value
+
+    def get(self, key, default=None):
+        value = self.values[self.position(key)]
+        return default if value is _unset else value
+
+    # 位置（部材の番号、signedの場合はslot_of）で読む、未設定はdefault
+    def at(self, position, default=None):
+        value = self.values[position]
+        return default if value is _unset else value
+
+    def __eq__(self, other):
+        return isinstance(other, ProductValues) and self.signed == other.signed and self.values == other.values
+
+    # (部材,) / (部材, 符号) → 値（設定されたものだけ）
+    def items(self):
+        keys = [(product_id, sign_id) for product_id in num_product_list for sign_id in sign] if self.signed else [(product_id,) for product_id in num_product_list]
+        return [(key, value) for key, value in zip(keys, self.values) if value is not _unset]
+
+    def __repr__(self):
+        return f"ProductValues({dict(self.items())})"
+
+    # pickleで_unsetを同じオブジェクトに戻す
+    def __getstate__(self):
+        return self.signed, [(index, value) for index, value in enumerate(self.values) if value is not _unset]
+
+    def __setstate__(self, state):
+        self.signed, values = state
+        self.values = [_unset] * (len(num_product_list) * len(sign) if self.signed else len(num_product_list))
+        for index, value in values:
+            self.values[index] = value
+
+
+# エッジの最適化変数
+# 部材 × 符号 の位置（slot_of）に変数を入れた固定長のリストで持つ（作らなかった変数はNone）
+# 組み立て・集計は部材・符号の番号で行い、従来の (元のnode_id, 先のnode_id, 機能, 部材, 符号) のキーでも読める
+class FlowVars:
+    __slots__ = ("edge", "vars")
+
+    def __init__(self, edge):
+        self.edge = edge
+        self.vars = [None] * (len(num_product_list) * len(sign))
+
+    def at(self, product, sign_code):
+        return self.vars[slot_of(product, sign_code)]
+
+    # 作成された変数の (部材の番号, 符号の番号, 変数)
+    def entries(self):
+        return [(slot // len(sign), slot % len(sign), var) for slot, var in enumerate(self.vars) if var is not None]
+
+    # 作成された符号sign_codeの変数の (部材の番号, 変数)
+    def by_sign(self, sign_code):
+        return [(product, var) for product, var in enumerate(self.vars[sign_code::len(sign)]) if var is not None]
+
+    def values(self):
+        return [var for var in self.vars if var is not None]
+
+    # 以下は従来のキー（タプル）での参照用
+    # キーは従来どおりnode_id・機能の文字列のまま（モデルの組み立て・集計では使わず、機能はfunction_codeで引く）
+    def key(self, slot):
+        edge = self.edge
+        return (edge.source.node_id, edge.target.node_id, edge.function, num_product_list[slot // len(sign)], sign[slot % len(sign)])
+
+    def keys(self):
+        return [self.key(slot) for slot, var in enumerate(self.vars) if var is not None]
+
+    def items(self):
+        return [(self.key(slot), var) for slot, var in enumerate(self.vars) if var is not None]
+
+    def get(self, key, default=None):
+        var = self.vars[slot_of(product_index[key[-2]], sign_index[key[-1]])]
+        return default if var is None else var
+
+    def __getitem__(self, key):
+        var = self.get(key)
+        if var is None:
+            raise KeyError(key)
+        return var
+
+    def __setitem__(self, key, var):
+        self.vars[slot_of(product_index[key[-2]], sign_index[key[-1]])] = var
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.vars) - self.vars.count(None)
+
 
 class Node:
+    # 計画期間の月の数だけ作られるので、インスタンスごとの__dict__を持たせない
+    __slots__ = ("name", "month", "node_id", "lat", "lon", "kind", "role", "cost", "capacity", "wet_storage_capacity", "wet_storage_cost", "steel", "turbine", "calc_supply_demand")
+
     def __init__(self):
         # ノード名
         self.name = None
@@ -56,11 +236,13 @@ class Node:
         self.turbine = None
 
         # 計算用の需要供給量
-        self.calc_supply_demand = {}
+        self.calc_supply_demand = ProductValues()
 
 
 
 class Transportation_Edge:
+    __slots__ = ("source", "target", "month", "function", "cost", "capacity", "distance", "flow", "calc_cost", "calc_capacity")
+
     def __init__(self):
         # 元のnode_id、Node型
         self.source = None
@@ -76,19 +258,21 @@ class Transportation_Edge:
         self.cost = {}
         # キャパシティ → csvから各部材のキャパシティを順番に受け取る
         self.capacity = {}
+        # 2点間距離[km]（船舶のコスト計算用）
+        self.distance = None
 
         # 最適化変数
-        self.flow = {}
-        # 最適化変数と同じ値だが、表計算のために用いる
-        self.flow_value = {}
+        self.flow = FlowVars(self)
 
         # 計算用のコスト・キャパシティ
-        self.calc_cost = {}
-        self.calc_capacity = {}
+        self.calc_cost = ProductValues()
+        self.calc_capacity = ProductValues(signed=True)
 
 
 
 class Production_Edge:
+    __slots__ = ("source", "target", "function", "function_code", "cost", "capacity", "flow", "calc_cost", "calc_capacity")
+
     def __init__(self):
         # 元のnode_id、Node型
         self.source = None
@@ -97,6 +281,8 @@ class Production_Edge:
 
         # 機能決定
         self.function = None
+        # 機能の番号（function_index、変数・B行列の組み立てに使う）
+        self.function_code = None
 
         # コスト → functionによってNode.costのあるvalueからコストを受け取る
         self.cost = None
@@ -104,15 +290,17 @@ class Production_Edge:
         self.capacity = None
 
         # 最適化変数
-        self.flow = {}
+        self.flow = FlowVars(self)
 
         # 計算用のコスト・キャパシティ
-        self.calc_cost = {}
-        self.calc_capacity = {}
+        self.calc_cost = ProductValues()
+        self.calc_capacity = ProductValues(signed=True)
 
 
 
 class Storage_Edge:
+    __slots__ = ("source", "target", "month", "function", "cost", "capacity", "flow", "calc_cost", "calc_capacity")
+
     def __init__(self):
         # 元のnode_id、Node型
         self.source = None
@@ -130,19 +318,182 @@ class Storage_Edge:
         self.capacity = None
 
         # 最適化変数
-        self.flow = {}
-        # 最適化変数と同じ値だが、表計算のために用いる
-        self.flow_value = {}
+        self.flow = FlowVars(self)
 
         # 計算用のコスト・キャパシティ
-        self.calc_cost = {}
-        self.calc_capacity = {}
+        self.calc_cost = ProductValues()
+        self.calc_capacity = ProductValues(signed=True)
 
 
-# 実行関数
-def optimize(node_rows, edge_rows):
-    # 問題設定
-    model: Model = Model('sample')
+class NodeRegistry:
+    def __init__(self):
+        # (ノード名, 月) → Node の辞書、定数時間で参照する
+        self.nodes = {}
+
+    def add(self, node):
+        # 同じ (ノード名, 月) が既にある場合はcsvの重複
+        key = (node.name, node.month)
+        if key in self.nodes:
+            raise ValueError(f"ノードが重複しています: 場所={node.name}, 月={node.month}")
+        self.nodes[key] = node
+
+    def get(self, name, month):
+        try:
+            return self.nodes[(name, month)]
+        except KeyError:
+            raise ValueError(f"ノードが見つかりません: 場所={name}, 月={month}（node.csvに記載されているか確認してください）") from None
+
+
+# 年付きの計画期間を作成
+# make_horizon(2025, 11, 36) → ["2025年11月", "2025年12月", "2026年1月", ..., "2028年10月"]
+# 開始月が1〜12でない、期間数が1未満の場合はValueError
+def make_horizon(start_year, start_month, num_periods):
+    if not 1 <= start_month <= 12:
+        raise ValueError(f"開始月は1〜12で指定してください: {start_month}")
+    if num_periods < 1:
+        raise ValueError(f"期間数は1以上で指定してください: {num_periods}")
+    horizon = []
+    for index in range(num_periods):
+        year, month = divmod(start_month - 1 + index, 12)
+        horizon.append(f"{start_year + year}年{month + 1}月")
+    return horizon
+
+
+# 作成されなかったフローだけからなる制約（0 == 0など、常に満たされる）は追加しない
+# 変数を含まないが満たされない制約はここでは判定しないので、需給制約のように右辺が定数の行は呼び出し側で判定する
+def add_cons(model, cons):
+    if isinstance(cons, bool) or not any(len(term) > 0 for term in cons.expr.terms):
+        return None
+    return model.addCons(cons)
+
+
+# 作成する変数の上限（functionが扱わない部材、キャパシティ0の場合は0 → 変数を作らない）
+# product・sign_codeは部材・符号の番号
+def flow_capacity(edge, product, sign_code):
+    slot = product * len(sign) + sign_code
+    if isinstance(edge, Production_Edge) and slot not in production_slots[edge.function_code]:
+        return 0
+    if isinstance(edge, Storage_Edge) and slot not in storage_slots:
+        return 0
+    return edge.calc_capacity.at(slot, 0)
+
+
+# 結果表の列（1行 = 1変数、月は流出元ノードの月）
+# kindはtransportation / production / storage、まとめた設置海域ノードへのエッジはaggregate
+result_columns = ["kind", "source", "target", "month", "function", "product", "sign", "value"]
+
+
+# 結果表（列ごとの配列）
+# 文字列の列は値の一覧（labels、同じ値は1つだけ持つ）とその番号の配列（codes）で持つ
+# table[列名] は従来どおり文字列の配列を返す（呼ぶたびに作る）、集計・絞り込みはcodesを使う
+class ResultTable:
+    __slots__ = ("labels", "codes", "value")
+
+    def __init__(self, labels, codes, value):
+        # 列名 → 値のタプル
+        self.labels = labels
+        # 列名 → 値の番号の配列
+        self.codes = codes
+        # 変数の値
+        self.value = value
+
+    def __getitem__(self, name):
+        if name == "value":
+            return self.value
+        return np.array(self.labels[name], dtype=str)[self.codes[name]]
+
+    def __len__(self):
+        return len(self.value)
+
+    def keys(self):
+        return list(result_columns)
+
+    # 列の値がlabelの行
+    def equals(self, name, label):
+        if label not in self.labels[name]:
+            return np.zeros(len(self), dtype=bool)
+        return self.codes[name] == self.labels[name].index(label)
+
+    # 番号の配列 → 値のリスト
+    def decode(self, name, codes):
+        labels = self.labels[name]
+        return [labels[code] for code in codes.tolist()]
+
+
+# 解いた後のモデルから全変数の値を1回で取り出し、列ごとのNumPy配列（ResultTable）にまとめる
+# 結果の表示・地図作成はこの表から行う
+# solを指定した場合はその解（外部で解いた解など）の値を使う
+def result_table(model, transportation_list, production_list, storage_list, sol=None):
+    sol = sol or model.getBestSol()
+    # 列名 → {値: 番号}（現れた順に番号をつける、部材・符号は部材・符号の番号のまま）
+    labels = {name: {} for name in result_columns[:-1]}
+    labels["product"] = {product_id: product for product, product_id in enumerate(num_product_list)}
+    labels["sign"] = {sign_id: sign_code for sign_code, sign_id in enumerate(sign)}
+    codes = {name: [] for name in result_columns[:-1]}
+    values = []
+
+    def code(name, label):
+        return labels[name].setdefault(label, len(labels[name]))
+
+    for kind, edge_list in (("transportation", transportation_list), ("production", production_list), ("storage", storage_list)):
+        for edge in edge_list:
+            # エッジごとに同じ値の列は1回だけ番号にする
+            edge_codes = {
+                "kind": code("kind", "aggregate" if edge.target.month == aggregate_month else kind),
+                "source": code("source", edge.source.name),
+                "target": code("target", edge.target.name),
+                "month": code("month", edge.source.month),
+                "function": code("function", edge.function)
+            }
+            for product, sign_code, var in edge.flow.entries():
+                for name, value in edge_codes.items():
+                    codes[name].append(value)
+                codes["product"].append(product)
+                codes["sign"].append(sign_code)
+                values.append(sol[var])
+    return ResultTable(
+        {name: tuple(label_codes) for name, label_codes in labels.items()},
+        {name: np.array(codes[name], dtype=np.min_scalar_type(max(len(labels[name]) - 1, 0))) for name in codes},
+        np.array(values, dtype=float)
+    )
+
+
+# 結果表をcolumnsの値の組ごとに合計（maskの行のみ）
+# 値の組 → 合計値 の辞書（並びは結果表で最初に現れた順）
+def group_sum(table, columns, mask):
+    keys = np.stack([table.codes[name][mask].astype(np.int64) for name in columns], axis=1)
+    if len(keys) == 0:
+        return {}
+    unique_keys, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=table.value[mask], minlength=len(unique_keys))
+    order = np.argsort(first)
+    unique_keys = unique_keys[order]
+    decoded = [table.decode(name, unique_keys[:, index]) for index, name in enumerate(columns)]
+    return {key: total for key, total in zip(zip(*decoded), sums[order].tolist())}
+
+
+# ノード・月ごとの生産量・仮置量（minusのフローのみ）
+# (月, ノード名) → [(機能, 値), ...]
+def node_results(table, kind):
+    mask = table.equals("kind", kind) & table.equals("sign", "minus") & (table.value >= 0.1)
+    results = {}
+    for month, name, function, value in zip(table.decode("month", table.codes["month"][mask]), table.decode("source", table.codes["source"][mask]), table.decode("function", table.codes["function"][mask]), table.value[mask].tolist()):
+        results.setdefault((month, name), []).append((function, value))
+    return results
+
+
+# csvの読み込み（行のリスト）
+# ファイルのパス、行の文字列（TextIOWrapperなど）、読み込み済みの行（List[List[str]]）のどれでも受け取る
+def csv_rows(source):
+    return list(iter_rows(source))
+
+
+# csv → ネットワーク（ノード・エッジ）作成
+# horizonは計画期間のリスト（Noneの場合はlayer_network_list）
+# recordsにread_networkの結果を渡した場合はcsvを読み直さない（benchmark.pyで読み込みと作成を分けて計測する）
+def build_network(node_rows, edge_rows, horizon=None, records=None):
+    if horizon is None:
+        horizon = layer_network_list
     # ノードリストを格納するリスト
     node_list: list[Node] = []
     # 輸送リストを格納するリスト
@@ -151,36 +502,28 @@ def optimize(node_rows, edge_rows):
     production_list: list[Production_Edge] = []
     # 仮置リストを格納するリスト
     storage_list: list[Storage_Edge] = []
-
-    # node_rows は List[List[str]] として渡されているので
-    # そのまま 1 行ずつ処理します
-    # ノード用のCSVファイルを読み込む
-    if isinstance(node_rows, str):
-        f_node = open(node_rows, encoding='utf-8-sig')
-        reader_node = csv.reader(f_node)
-    else:
-        # 既に TextIOWrapper なのでそのまま
-        reader_node = csv.reader(node_rows)
-    next(reader_node, None)     # ヘッダーをスキップ
-    for row in reader_node:
-        if not row or not row[0]:
-            continue
-        # 繰り返しでlayer_network_list個生成
-        for index, month in enumerate(layer_network_list):
+    # (ノード名, 月) → Node の索引
+    node_registry = NodeRegistry()
+
+    # ノード・エッジのCSVファイルを読み込んでチェック（誤りがあればここでまとめてCsvError）
+    node_records, edge_records = records or read_network(node_rows, edge_rows, horizon)
+    for record in node_records:
+        # 繰り返しで計画期間の数だけ生成
+        for index, month in enumerate(horizon):
             # Nodeクラスを作成
             node = Node()
             # 相生
-            node.name = row[0]
+            node.name = record.name
             # "11月"
             node.month = month
             node.node_id = f"({node.name}_{node.month})"
 
             # 緯度、経度を取得
-            node.lat = float(row[1])
-            node.lon = float(row[2])
+            node.lat = record.lat
+            node.lon = record.lon
 
             # 小型造船所、中型造船所、大型造船所、基地港湾、設置海域、なし（仮置のみ）
-            node.kind = row[3]
+            node.kind = record.kind
 
             # node.roleを一旦決定
             node.role = {"モジュール製作": False, "ハーフボディ1製作": False, "ハーフボディ3製作": False, "浮体基礎製作": False, "洋上での浮体基礎製作": False, "風車組立": False, "風車設置": False, "仮置": False}
@@ -208,18 +551,18 @@ def optimize(node_rows, edge_rows):
 
 
             # 仮置を行うかを自分で決定
-            if row[4] == "TRUE":
+            if record.storage:
                 node.role["仮置"] = True
                 # 仮置のコスト
-                node.wet_storage_cost = float(row[5]) if row[5] else None
+                node.wet_storage_cost = record.storage_cost
                 # 仮置の数 
-                node.wet_storage_capacity = int(row[6]) if row[6] else None
+                node.wet_storage_capacity = record.storage_capacity
             else:
                 node.role["仮置"] = False
                 node.wet_storage_cost = 0
                 node.wet_storage_capacity = 0
             # 洋上での浮体基礎製作を行うかを自分で決定
-            if row[7] == "TRUE":
+            if record.offshore_foundation:
                 node.role["洋上での浮体基礎製作"] = True
             else:
                 node.role["洋上での浮体基礎製作"] = False
@@ -241,7 +584,7 @@ def optimize(node_rows, edge_rows):
             for task_index, (task, is_active) in enumerate(list(node.role.items())[:-1]): # -1で仮置を除外
                 # モジュール製作だけは特別（CSV:x基分で設定、キャパシティ:4個=1基分で数が違うため）
                 if task == "モジュール製作":
-                        sss[task] = sss[task] + float(row[10 + 3 * task_index]) if row[10 + 3 * task_index] else 0
+                        sss[task] = sss[task] + record.task_capacity[task_index] if record.task_capacity[task_index] is not None else 0
                         # capacityの整数部分をnode.capacity[task]に格納
                         node.capacity[task] = 4 * int(sss[task])
                         # 小数部分をsssに格納
@@ -250,7 +593,7 @@ def optimize(node_rows, edge_rows):
                 # それ以外のrole
                 else:                    
                     if is_active: # モジュール製作、ハーフボディ1製作 ･･･ と繰り返し    
-                        sss[task] = sss[task] + float(row[10 + 3 * task_index]) if row[10 + 3 * task_index] else 0
+                        sss[task] = sss[task] + record.task_capacity[task_index] if record.task_capacity[task_index] is not None else 0
                         # capacityの整数部分をnode.capacity[task]に格納
                         node.capacity[task] = int(sss[task])
                         # 残りをsssに格納
@@ -261,27 +604,26 @@ def optimize(node_rows, edge_rows):
             # モジュール製作 → ハーフボディ1製作 ･･･ と繰り返しでCSVからコストを受け取る、Falseの場合は初期化した値
             for task_index, (task, is_active) in enumerate(list(node.role.items())[:-1]): # -1で仮置を除外
                 if is_active:
-                    # コストとキャパシティを適切なインデックスから取得、ミスした場合はNone
-                    node.cost[task] = float(row[9 + 3 * task_index]) if row[9 + 3 * task_index] else None
-                    # node.capacity[task] = float(row[9 + 3 * task_index]) if row[9 + 3 * task_index] else None
+                    # コストを取得、空欄の場合はNone
+                    node.cost[task] = record.task_cost[task_index]
                 
                 # 風車設置が何月から行えるか
-                # プロジェクトが2年以上の場合は未定
                 if node.role["風車設置"] == True:
                     # csvから受け取った月より前の時期は風車設置不可能
-                    if layer_network_list.index(month) >= layer_network_list.index(f"{row[31]}月"):# 整数
-                        node.capacity["風車設置"] = int(row[28]) if row[28] else 0
+                    if index >= record.install_start:
+                        node.capacity["風車設置"] = record.task_capacity[-1] or 0
                     else:
                         node.capacity["風車設置"] = 0
 
 
             # 鋼材の供給量
-            node.steel = int(row[29]) if row[29] else int(0)
+            node.steel = record.steel
             # 風車の需要量
             node.turbine = int(0)
 
             # node_listに追加
             node_list.append(node)
+            node_registry.add(node)
             # 各node_listを表示
             # print(f"Node 場所: {node.node_id}, 種類: {node.kind}, 役割: {node.role}, コスト: {node.cost}, キャパシティ: {node.capacity}, 仮置コスト: {node.wet_storage_cost}, 仮置キャパシティ: {node.wet_storage_capacity}, 鋼材: {node.steel}")
 
@@ -292,13 +634,14 @@ def optimize(node_rows, edge_rows):
                 if is_active:
                     # roleのvalueがTrueの場合に、グラフループ=Production_Edgeクラスを作成
                     production_edge = Production_Edge()
-                    # node_listから対応するnode_idを取得（これやらないとstr型判定喰らう）
-                    node_year = node_list[[x.node_id for x in node_list].index(f'({node.name}_{month})')]
+                    # node_registryから対応するNodeを取得（これやらないとstr型判定喰らう）
+                    node_year = node_registry.get(node.name, month)
                     # 流出元、流出先を設定（グラフループなので同じ）
                     production_edge.source = node_year
                     production_edge.target = node_year
                     # 機能を設定、モジュール製作、ハーフボディ1製作、ハーフボディ3製作、浮体基礎製作、洋上での浮体基礎製作、風車組立、風車設置
                     production_edge.function = task
+                    production_edge.function_code = function_index[task]
                     # 処理コストを設定
                     production_edge.cost = node.cost[task]
                     # 処理キャパシティを設定
@@ -315,14 +658,14 @@ def optimize(node_rows, edge_rows):
             if index != 0:          
                 # 仮置のエッジを作成（仮置: Falseの場合でも追加）
                 storage_edge = Storage_Edge()
-                # node_listから対応するnode_idを取得（これやらないとstr型判定喰らう）
-                node_from_year = node_list[[x.node_id for x in node_list].index(f'({node.name}_{layer_network_list[index - 1]})')]
-                node_to_year = node_list[[x.node_id for x in node_list].index(f'({node.name}_{month})')]
+                # node_registryから対応するNodeを取得（これやらないとstr型判定喰らう）
+                node_from_year = node_registry.get(node.name, horizon[index - 1])
+                node_to_year = node_registry.get(node.name, month)
                 # 流出元、流出先を設定
                 storage_edge.source = node_from_year
                 storage_edge.target = node_to_year
 
-                storage_edge.month = layer_network_list[index - 1]
+                storage_edge.month = horizon[index - 1]
                 # 機能 = 仮置
                 storage_edge.function = "仮置"
                 # 仮置コスト
@@ -337,34 +680,35 @@ def optimize(node_rows, edge_rows):
 
 
         # 風車需要を定数で置くためのノード            
-        if row[3] == "設置海域":
+        if record.kind == "設置海域":
             # 各月の設置海域ノードを重ねたもの
             node = Node()
-            node.name = row[0]
+            node.name = record.name
             # 緯度、経度
-            node.lat = float(row[1])
-            node.lon = float(row[2])
+            node.lat = record.lat
+            node.lon = record.lon
 
             # 月の値には意味なし
-            node.month = "10000月"
+            node.month = aggregate_month
             node.node_id = f"({node.name}_{node.month})"
 
-            node.kind = row[3]
+            node.kind = record.kind
             node.role["風車設置"] = True
 
             # 鋼材の供給量
             node.steel = int(0)
             # 風車の需要数
-            node.turbine = int(row[30]) if row[30] else int(0)               
+            node.turbine = record.turbine               
             # node_listに追加
             node_list.append(node)
+            node_registry.add(node)
             # 各成分を表示
             # print(f"定数用Node 場所: {node.node_id}, 風車需要数: {node.turbine}")
 
             # for文で設置海域（毎月） → 設置海域（まとめたやつ）エッジ作成
-            for month in layer_network_list:
+            for month in horizon:
                 # 各月のノード
-                node_1 = node_list[[x.node_id for x in node_list].index(f'({node.name}_{month})')]
+                node_1 = node_registry.get(node.name, month)
                 # 各月の設置海域ノードとまとめた設置海域ノードを結ぶエッジを作成
                 transportation_edge = Transportation_Edge()
                 transportation_edge.source = node_1
@@ -373,6 +717,8 @@ def optimize(node_rows, edge_rows):
                 # コスト、キャパシティはあらかじめ決めておく
                 transportation_edge.cost = {key: int(0) for key in num_product_list}
                 transportation_edge.capacity = {key: int(10000) for key in num_product_list}
+                # まとめたノードへは実際に航行しないので船舶は使わない
+                transportation_edge.capacity["船舶"] = int(0)
                 # transportation_listに追加
                 transportation_list.append(transportation_edge)
 
@@ -380,25 +726,17 @@ def optimize(node_rows, edge_rows):
 
 
 
-    # edge_rows は List[List[str]] として渡されているので
-    if isinstance(edge_rows, str):
-        f_edge = open(edge_rows, encoding='utf-8-sig')
-        reader_edge = csv.reader(f_edge)
-    else:
-        reader_edge = csv.reader(edge_rows)
-    next(reader_edge, None)
-    for row in reader_edge:
-        if not row or not row[0]:
-            continue
+    # エッジ
+    for record in edge_records:
         # 流出元、流出先の名前を取得
-        source_name = row[0]
-        target_name = row[1]
+        source_name = record.source
+        target_name = record.target
 
-        # 名前を取得したらlayer_network_listだけ繰り返す
-        for month in layer_network_list:
+        # 名前を取得したら計画期間の数だけ繰り返す
+        for month in horizon:
             # ラベルからNodeクラスの"node_id"属性を取得
-            source_node = node_list[[x.node_id for x in node_list].index(f'({source_name}_{month})')]
-            target_node = node_list[[x.node_id for x in node_list].index(f'({target_name}_{month})')]
+            source_node = node_registry.get(source_name, month)
+            target_node = node_registry.get(target_name, month)
 
             # 輸送エッジの作成
             transportation_edge = Transportation_Edge()
@@ -420,455 +758,796 @@ def optimize(node_rows, edge_rows):
 
             # 船舶輸送のコストとキャパシティを設定
             # 基地港湾 → 設置海域の場合は浮体基礎の輸送の場合とコストが異なる               
-            if source_node.kind == "基地港湾" and target_node.kind == "設置海域":
-                transportation_edge.cost["船舶"] = 2 * ship_installation_cost * (math.ceil(int(row[3])/(24*10*1.852))) + int(row[3]) # 速度は10ノット
-                transportation_edge.capacity["船舶"] = row[4] # キャパシティは無限                
-            else:
-                transportation_edge.cost["船舶"] = 2 * ship_foundation_cost * (math.ceil(int(row[3])/(24*5*1.852))) + int(row[3]) # 速度は5ノット
-                transportation_edge.capacity["船舶"] = row[4]
+            transportation_edge.distance = record.distance
+            transportation_edge.cost["船舶"] = ship_cost(source_node.kind, target_node.kind, transportation_edge.distance)
+            transportation_edge.capacity["船舶"] = record.ship_capacity
 
-            # 2 * ship_foundation_cost * (math.ceil(int(row[3])/(24*5*1.852))) + int(row[3]) # 速度は5ノット
             # transportation_listに追加
             transportation_list.append(transportation_edge)
 
+    return node_list, transportation_list, production_list, storage_list
+
+
+# 船舶1隻あたりの輸送コスト = 2 × 傭船料 × 航行日数 + 距離[km]
+# 基地港湾 → 設置海域の場合は浮体基礎の輸送の場合と傭船料・速度が異なる
+# ratesは傭船料の倍率 {ship_rate_namesの名前: 倍率}（感度分析用、指定しないものは1倍）
+# 目的関数の係数が整数のほうがSCIPが速く解けるので、倍率をかけたコストは円単位に丸める
+def ship_cost(source_kind, target_kind, distance, rates=None):
+    rates = rates or {}
+    if source_kind == "基地港湾" and target_kind == "設置海域":
+        return round(2 * rates.get("ship_installation_cost", 1) * ship_installation_cost * math.ceil(distance/(24*10*1.852)) + distance) # 速度は10ノット
+    return round(2 * rates.get("ship_foundation_cost", 1) * ship_foundation_cost * math.ceil(distance/(24*5*1.852)) + distance) # 速度は5ノット
+
+
+# 船舶の単価の倍率を変えて輸送エッジの船舶のコスト（計算用も）を設定し直す
+# まとめた設置海域へのエッジ（距離なし）は船舶を使わないのでコスト0のまま
+def set_ship_rates(transportation_list, rates):
+    for transportation_edge in transportation_list:
+        if transportation_edge.distance is None:
+            continue
+        transportation_edge.cost["船舶"] = ship_cost(transportation_edge.source.kind, transportation_edge.target.kind, transportation_edge.distance, rates)
+        transportation_edge.calc_cost["船舶"] = transportation_edge.cost["船舶"]
+
+
+# 計算用の需給・コスト・キャパシティを設定
+def set_calc_parameters(node_list, transportation_list, production_list, storage_list):
     # 需給
     for node in node_list:
         for product_id in num_product_list:
             # 鋼材の供給量と風車の需要数は入力値を使う
             if product_id == "鋼材":
-                node.calc_supply_demand[node.node_id, product_id] = node.steel
+                node.calc_supply_demand[product_id] = node.steel
 
-            elif product_id == "風車（設置済）": # 10000月はlayer_network_listの設置海域をまとめたノード
-                node.calc_supply_demand[node.node_id, product_id] = - node.turbine
+            elif product_id == "風車（設置済）": # aggregate_monthは計画期間の設置海域をまとめたノード
+                node.calc_supply_demand[product_id] = - node.turbine
             # それ以外の部材については0
             else:
-                node.calc_supply_demand[node.node_id, product_id] = int(0)
+                node.calc_supply_demand[product_id] = int(0)
 
-    # transportation_listの計算用コスト・キャパシティ・変数
+    # transportation_listの計算用コスト・キャパシティ
     for transportation_edge in transportation_list:
         # 部品名
         for product_id in num_product_list:
             # コストを設定
-            transportation_edge.calc_cost[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id)] = transportation_edge.cost[product_id]
+            transportation_edge.calc_cost[product_id] = transportation_edge.cost[product_id]
             # plus,minus
             for sign_id in sign:
-                # キャパシティを設定
-                transportation_edge.calc_capacity[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id)] = transportation_edge.capacity[product_id]
-                # 変数を設定
-                transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id)] = model.addVar(name=f'x_transportation_{transportation_edge.source.node_id}_{transportation_edge.target.node_id}_{transportation_edge.function}_{product_id}_{sign_id}', vtype='I')
-                # 変数と同じ値をflow_valueに格納して表作成時に用いる
-                transportation_edge.flow_value[(transportation_edge.source.name, transportation_edge.target.name, transportation_edge.source.month, product_id, sign_id)] = model.addVar(name=f'x_transportation_{transportation_edge.source.node_id}_{transportation_edge.target.node_id}_{transportation_edge.function}_{product_id}_{sign_id}', vtype='I')
-                model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id)] == transportation_edge.flow_value[(transportation_edge.source.name, transportation_edge.target.name, transportation_edge.source.month, product_id, sign_id)])
+                # キャパシティを設定（船舶が使えないエッジでは船舶で運ぶ部材も流せない）
+                if product_id in ship_load and transportation_edge.capacity["船舶"] == 0:
+                    transportation_edge.calc_capacity[product_id, sign_id] = 0
+                else:
+                    transportation_edge.calc_capacity[product_id, sign_id] = transportation_edge.capacity[product_id]
 
     # production_listの計算用コスト（長くなるのでコストのみ）
-    # 条件を事前に定義
-    cost_mapping = {
-        "モジュール製作": "モジュール",
-        "ハーフボディ1製作": "ハーフボディ1",
-        "ハーフボディ3製作": "ハーフボディ3",
-        "浮体基礎製作": "浮体基礎",
-        "洋上での浮体基礎製作": "浮体基礎",
-        "風車組立": "風車",
-        "風車設置": "風車（設置済）",
-    }
-    # コスト
+    # 条件はcost_mappingで事前に定義
     for production_edge in production_list:
         for product_id in num_product_list:
             # 各function（ex.モジュール製作）のvalue（モジュール製作ならモジュール）をcost_mappingから取得、それをproduct_id（ex.モジュール）と比較
             if cost_mapping.get(production_edge.function) == product_id:
-                production_edge.calc_cost[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id)] = production_edge.cost
+                production_edge.calc_cost[product_id] = production_edge.cost
             else:
-                production_edge.calc_cost[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id)] = 0
+                production_edge.calc_cost[product_id] = 0
 
 
-    # production_listの計算用キャパシティ
+    # production_listの計算用キャパシティ（レシピにある組のみ、投入される部材は数倍、それ以外は0）
     for production_edge in production_list:
+        ratios = production_compatibility.get(production_edge.function, {})
         for product_id in num_product_list:
             for sign_id in sign:
-                if production_edge.function == "モジュール製作":
-                    if (product_id == "鋼材" and sign_id == "plus") or (product_id == "モジュール" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                elif production_edge.function == "ハーフボディ1製作":
-                    if (product_id == "モジュール" and sign_id == "plus") or (product_id == "ハーフボディ1" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                elif production_edge.function == "ハーフボディ3製作":
-                    if (product_id == "モジュール" and sign_id == "plus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 3 * production_edge.capacity
-                    elif (product_id == "ハーフボディ3" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                elif production_edge.function == "浮体基礎製作" or production_edge.function == "洋上での浮体基礎製作":
-                    if (product_id == "ハーフボディ1" and sign_id == "plus") or (product_id == "ハーフボディ3" and sign_id == "plus") or (product_id == "浮体基礎" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                elif production_edge.function == "風車組立":
-                    if (product_id == "浮体基礎" and sign_id == "plus") or (product_id == "風車" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                elif production_edge.function == "風車設置":
-                    if (product_id == "風車" and sign_id == "plus") or (product_id == "風車（設置済）" and sign_id == "minus"):
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = production_edge.capacity
-                    else:
-                        production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = 0
-                # 追加
-                else:
-                    production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "船舶")] = 0
+                ratio = ratios.get((product_id, sign_id), 0)
+                production_edge.calc_capacity[product_id, sign_id] = ratio * production_edge.capacity
 
-    # production_listの計算用変数
-    for production_edge in production_list:
-        for product_id in num_product_list:
-            for sign_id in sign:
-                production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] = model.addVar(name=f'x_production_{production_edge.source.node_id}_{production_edge.target.node_id}_{production_edge.function}_{product_id}_{sign_id}', vtype='I')
-
-    # storage_listの計算用コスト・キャパシティ・変数
+    # storage_listの計算用コスト・キャパシティ
     for storage_edge in storage_list:
         for product_id in num_product_list:
             # 浮体基礎のみコストを設定
             if product_id == "浮体基礎":
                 # コストを設定
-                storage_edge.calc_cost[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id)] = storage_edge.cost
+                storage_edge.calc_cost[product_id] = storage_edge.cost
             else:
-                storage_edge.calc_cost[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id)] = 0
+                storage_edge.calc_cost[product_id] = 0
             # plus,minus
             for sign_id in sign:
                 if product_id == "浮体基礎":
                     # キャパシティを設定
-                    storage_edge.calc_capacity[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)] = storage_edge.capacity
+                    storage_edge.calc_capacity[product_id, sign_id] = storage_edge.capacity
                 else:
-                    storage_edge.calc_capacity[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)] = 0
-                # 変数を設定
-                storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)] = model.addVar(name=f'x_storage_{storage_edge.source.node_id}_{storage_edge.target.node_id}_{storage_edge.function}_{product_id}_{sign_id}', vtype='I')
-                # 変数と同じ値をflow_valueに格納し表作成時に用いる
-                storage_edge.flow_value[(storage_edge.source.name, storage_edge.target.name, storage_edge.source.month, product_id, sign_id)] = model.addVar(name=f'x_storage_{storage_edge.source.node_id}_{storage_edge.target.node_id}_{storage_edge.function}_{product_id}_{sign_id}', vtype='I')
-                model.addCons(storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)] == storage_edge.flow_value[(storage_edge.source.name, storage_edge.target.name, storage_edge.source.month, product_id, sign_id)])
-
-    # フローがキャパシティを超えないように
-    for transportation_edge in transportation_list:
-        for product_id in num_product_list:
-            for sign_id in sign:
-                model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id)] <= transportation_edge.calc_capacity[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id)])
+                    storage_edge.calc_capacity[product_id, sign_id] = 0
 
-    for production_edge in production_list:
-        for product_id in num_product_list:
-            for sign_id in sign:
-                model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)] <= production_edge.calc_capacity[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id)])
 
-    for storage_edge in storage_list:
-        for product_id in num_product_list:
-            for sign_id in sign:
-                model.addCons(storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)] <= storage_edge.calc_capacity[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id)])
+# 1本ずつ変数・制約を追加してモデルを作成
+# vtype='C' の場合はフローを連続変数にする（LP緩和）
+def build_model(model, node_list, transportation_list, production_list, storage_list, vtype='I'):
+    # 変数を設定（キャパシティは上限として与え、0の場合は変数を作らない、Noneの場合は上限なし）
+    for kind, edge_list in (("transportation", transportation_list), ("production", production_list), ("storage", storage_list)):
+        for edge in edge_list:
+            for product, product_id in enumerate(num_product_list):
+                for sign_code, sign_id in enumerate(sign):
+                    calc_capacity = flow_capacity(edge, product, sign_code)
+                    if calc_capacity != 0:
+                        edge.flow.vars[product * len(sign) + sign_code] = model.addVar(name=f'x_{kind}_{edge.source.node_id}_{edge.target.node_id}_{edge.function}_{product_id}_{sign_id}', vtype=vtype, ub=calc_capacity)
 
     # 船舶を用いて部材輸送を行うと仮定してコスト計算
+    # 変数は部材・符号の番号で直接取り出す（キャパシティ0で作成されなかったフローは定数0として扱う）
     # 輸送
     for transportation_edge in transportation_list:
-        for sign_id in sign:
-            model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "船舶", sign_id)] >= \
-                        1/12 * transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "モジュール", sign_id)] + \
-                        1/10 * transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "ハーフボディ1", sign_id)] + \
-                        2/5 * transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "ハーフボディ3", sign_id)] + \
-                        # ここで1隻の船舶で運べる浮体の数を入力
-                        1/2 * transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "浮体基礎", sign_id)] + \
-                            transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "鋼材", sign_id)] + \
-                            transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "風車", sign_id)])
-    # production,storageでは、船舶のフローは0
-    for production_edge in production_list:
-        for product_id in num_product_list:
-            for sign_id in sign:
-                model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "船舶", sign_id)] == 0)
-
-    for storage_edge in storage_list:
-        for product_id in num_product_list:
-            model.addCons(storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, "船舶", "minus")] == 0)
-
-    ## 修正ポイント
-    for transportation_edge in transportation_list:
-        if transportation_edge.target.node_id == "(能代沖6_10000月)" and transportation_edge.function == "輸送":
-            model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "船舶", "minus")] == 0)
-
+        flow = transportation_edge.flow.vars
+        for sign_code in range(len(sign)):
+            # ここで1隻の船舶で運べる部材の数を入力（ship_load）
+            ship = flow[slot_of(SHIP, sign_code)]
+            add_cons(model, (0 if ship is None else ship) >= quicksum(ratio * flow[slot_of(product, sign_code)] for product, ratio in ship_load_codes if flow[slot_of(product, sign_code)] is not None))
 
     # sign_idのplusとminusでflowが不変
-    # 輸送
-    for transportation_edge in transportation_list:
-        for product_id in num_product_list:
-            model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "plus")] == transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "minus")])
-            
-    # 仮置
-    for storage_edge in storage_list:
-        for product_id in num_product_list:
-            model.addCons(storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, "plus")] == storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, "minus")])
-
-    ## 修正ポイント
-    for transportation_edge in transportation_list:
-        if transportation_edge.target.node_id == "(能代沖_10000月)" and transportation_edge.function == "輸送":
-            model.addCons(transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, "船舶", "minus")] == 0)
-
-
-
-
-
-    # B行列
+    # 輸送 → 仮置
+    for edge in transportation_list + storage_list:
+        flow = edge.flow.vars
+        for product in range(len(num_product_list)):
+            plus, minus = flow[slot_of(product, PLUS)], flow[slot_of(product, MINUS)]
+            add_cons(model, (0 if plus is None else plus) == (0 if minus is None else minus))
+
+    # B行列（各エッジのfunctionのレシピの変換式のみ）
     for production_edge in production_list:
-        # モジュール製作を想定
-        model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "鋼材", "plus")] == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "minus")])
-        # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "鋼材", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "鋼材", "minus")])
-
-        # ハーフボディ1製作を想定（ここだけは場合分け必要）
-        if production_edge.function == "ハーフボディ1製作":
-            model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "plus")] == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ1", "minus")])
-            # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "minus")])
-
-        # ハーフボディ3製作を想定（ここだけは場合分け必要）
-        if production_edge.function == "ハーフボディ3製作":
-            model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "plus")] == 3 * production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ3", "minus")])
-            # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "モジュール", "minus")])
-
-        # 浮体基礎製作、洋上での浮体基礎製作を想定
-        # ハーフボディ1とハーフボディ3の流出量が等しい（変換前）
-        model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ1", "plus")] == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ3", "plus")])
-        # 変換前と変換後の部材比率
-        model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ1", "plus")] / 2 + production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ3", "plus")] / 2 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "浮体基礎", "minus")])
-        # 変換後のハーフボディ1とハーフボディ3の部材は0
-        # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ1", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ1", "minus")])
-        # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ3", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "ハーフボディ3", "minus")])
-
-        # 風車組立を想定
-        model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "浮体基礎", "plus")] == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車", "minus")])
-        # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "浮体基礎", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "浮体基礎", "minus")])
-
-        # 風車設置を想定
-        model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車", "plus")] == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車（設置済）", "minus")])
-        # model.addCons(production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車", "plus")] * 0 == production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車", "minus")])
-
-
-
-
+        flow = production_edge.flow.vars
+        for row in bom_slot_rows[production_edge.function_code]:
+            add_cons(model, quicksum(coefficient * flow[slot] for slot, coefficient in row.items() if flow[slot] is not None) == 0)
 
     # Mass Balance
     # そのノードでの流出量 - そのノードでの流入量 = そのノードでの生産量
-    # node_id × product_idごとに計算
+    # node_idごとに流出・流入エッジを一度だけ振り分けておく（輸送 → 製作 → 仮置の順）
+    out_edges = {node.node_id: [] for node in node_list}
+    in_edges = {node.node_id: [] for node in node_list}
+    for edge in transportation_list + production_list + storage_list:
+        out_edges[edge.source.node_id].append(edge)
+        in_edges[edge.target.node_id].append(edge)
+
+    # node_id × product_idごとに計算（変数は部材・符号の番号で直接取り出す）
     for node in node_list:
-        for product_id in num_product_list[:-1]:
+        for product, product_id in enumerate(num_product_list[:-1]):
             # print(f'NODE_ID: {node.node_id}, PRODUCT_ID: {product_id}')
+            plus_slot, minus_slot = slot_of(product, PLUS), slot_of(product, MINUS)
 
             # 各node_id,productから出るエッジを取得
-            plus_edge = [transportation_edge.flow[transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "plus"] for transportation_edge in transportation_list if transportation_edge.source.node_id == node.node_id] + [production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, "plus"] for production_edge in production_list if production_edge.source.node_id == node.node_id] + [storage_edge.flow[storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, "plus"] for storage_edge in storage_list if storage_edge.source.node_id == node.node_id]
+            plus_edge = [var for var in (edge.flow.vars[plus_slot] for edge in out_edges[node.node_id]) if var is not None]
             # print(f"出力フロー (x_plus): {plus_edge}")
 
             # 各node_id,productに入るエッジを取得
-            minus_edge = [transportation_edge.flow[transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "minus"] for transportation_edge in transportation_list if transportation_edge.target.node_id == node.node_id] + [production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, "minus"] for production_edge in production_list if production_edge.target.node_id == node.node_id] + [storage_edge.flow[storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, "minus"] for storage_edge in storage_list if storage_edge.target.node_id == node.node_id]
+            minus_edge = [var for var in (edge.flow.vars[minus_slot] for edge in in_edges[node.node_id]) if var is not None]
             # print(f"入力フロー (x_minus): {minus_edge}")
             
             # 制約をかける
             # そのノードでの流出量 - そのノードでの流入量 <= そのノードでの生産量
-            model.addCons((quicksum(plus_edge) - quicksum(minus_edge)) <= node.calc_supply_demand[node.node_id, product_id])
+            # 変数を含まない行は、満たされない場合（需要に対して流入エッジがない等）だけ実行不能として残す
+            if plus_edge or minus_edge or node.calc_supply_demand[product_id] < 0:
+                model.addCons((quicksum(plus_edge) - quicksum(minus_edge)) <= node.calc_supply_demand[product_id])
+
+    set_objective(model, transportation_list, production_list, storage_list)
 
-    # transportation_listのコストを計算
-    transportation_cost = 0
-    for transportation_edge in transportation_list:
-        for product_id in num_product_list:
-            transportation_cost += transportation_edge.calc_cost[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id)] * transportation_edge.flow[(transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "minus")]
+
+# 目的関数を設定（resolveで係数を変える場合も同じ関数で設定し直す）
+def set_objective(model, transportation_list, production_list, storage_list):
+    # transportation_listのコストを計算（作成されたminusのフローのみ）
+    transportation_cost = quicksum(transportation_edge.calc_cost.at(product) * var for transportation_edge in transportation_list for product, var in transportation_edge.flow.by_sign(MINUS))
 
     # production_listのコストを計算
-    production_cost = 0
-    for production_edge in production_list:
-        for product_id in num_product_list:
-            production_cost += production_edge.calc_cost[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id)] * production_edge.flow[(production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, "minus")]
+    production_cost = quicksum(production_edge.calc_cost.at(product) * var for production_edge in production_list for product, var in production_edge.flow.by_sign(MINUS))
 
     # storage_listのコストを計算
-    storage_cost = 0
-    for storage_edge in storage_list:
-        for product_id in num_product_list:
-            storage_cost += storage_edge.calc_cost[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id)] * storage_edge.flow[(storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, "minus")]
+    storage_cost = quicksum(storage_edge.calc_cost.at(product) * var for storage_edge in storage_list for product, var in storage_edge.flow.by_sign(MINUS))
 
     # コスト最小
     model.setObjective(transportation_cost + production_cost + storage_cost, sense='minimize')
 
-    # 最適化
-    model.hideOutput()
+
+# 解のコストの内訳（輸送・製作・仮置ごと、目的関数と同じくminusのフローにかかる）
+# solを指定しない場合は最適解
+def cost_breakdown(model, transportation_list, production_list, storage_list, sol=None):
+    sol = sol or model.getBestSol()
+    breakdown = {}
+    for kind, edge_list in (("transportation", transportation_list), ("production", production_list), ("storage", storage_list)):
+        breakdown[kind] = sum(edge.calc_cost.at(product) * sol[var] for edge in edge_list for product, var in edge.flow.by_sign(MINUS))
+    return breakdown
+
+
+# {(部材, plus/minus): 係数} のリスト → 行 × (部材 × plus/minus) の係数行列
+def coefficient_matrix(rows):
+    matrix = np.zeros((len(rows), len(num_product_list) * len(sign)))
+    for row_index, row in enumerate(rows):
+        for (product_id, sign_id), coefficient in row.items():
+            matrix[row_index, num_product_list.index(product_id) * len(sign) + sign.index(sign_id)] = coefficient
+    return matrix
+
+
+# NumPyの行列でモデルを作成し、MPSファイル経由でまとめてSCIPに渡す
+# 変数・制約はbuild_modelと同じものができる
+def build_model_matrix(model, node_list, transportation_list, production_list, storage_list, vtype='I'):
+    edge_list = transportation_list + production_list + storage_list
+    num_slot = len(num_product_list) * len(sign)
+    product_of_slot = np.repeat(np.arange(len(num_product_list)), len(sign))
+    sign_of_slot = np.tile(np.arange(len(sign)), len(num_product_list))
+    plus, minus = sign.index("plus"), sign.index("minus")
+
+    # キャパシティベクトル（エッジ × (部材, plus/minus)）、0の場合は変数を作らない、Noneは上限なし
+    capacity = np.array([[np.inf if c is None else c for c in (flow_capacity(edge, product, sign_code) for product in range(len(num_product_list)) for sign_code in range(len(sign)))] for edge in edge_list], dtype=float).reshape(len(edge_list), num_slot)
+    # コストベクトル（minusのフローにのみかかる）
+    cost = np.array([[edge.calc_cost.at(product) or 0 for product in range(len(num_product_list))] for edge in edge_list], dtype=float).reshape(len(edge_list), len(num_product_list))
+
+    # 変数の番号（作らない場合は-1）、並びはbuild_modelと同じエッジ → 部材 → plus/minus順
+    live = capacity != 0
+    col_index = np.full(live.shape, -1)
+    col_index[live] = np.arange(live.sum())
+    col_edge, col_slot = np.nonzero(live)
+    col_ub = capacity[live]
+    col_cost = np.where(sign_of_slot[col_slot] == minus, cost[col_edge, product_of_slot[col_slot]], 0.0)
+
+    # 制約は (行, 列, 係数) の三つ組と、行ごとの種類・右辺で持つ
+    entry_rows, entry_cols, entry_vals = [], [], []
+    row_sense, row_rhs = [], []
+
+    # 係数行列をエッジごとに適用して行を追加（変数を1つも含まない行は作らない、右辺はすべて0）
+    # matrixは全エッジ共通の (行 × 列) か、エッジごとの (エッジ × 行 × 列)
+    def add_rows(edge_index, matrix, sense):
+        cols = col_index[edge_index]
+        if matrix.ndim == 2:
+            matrix = np.broadcast_to(matrix, (len(edge_index),) + matrix.shape)
+        mask = (matrix != 0) & (cols[:, None, :] >= 0)
+        has_entry = mask.any(axis=2).ravel()
+        row_id = np.cumsum(has_entry) - 1 + len(row_sense)
+        edge_i, pattern_i, slot_i = np.nonzero(mask)
+        entry_rows.append(row_id[edge_i * matrix.shape[1] + pattern_i])
+        entry_cols.append(cols[edge_i, slot_i])
+        entry_vals.append(matrix[edge_i, pattern_i, slot_i])
+        row_sense.extend([sense] * int(has_entry.sum()))
+        row_rhs.extend([0.0] * int(has_entry.sum()))
+
+    transportation_index = np.arange(len(transportation_list))
+    production_index = np.arange(len(transportation_list), len(transportation_list) + len(production_list))
+    storage_index = np.arange(len(transportation_list) + len(production_list), len(edge_list))
+
+    # 船舶の台数 >= 船舶で運ぶ部材の数 × ship_load
+    add_rows(transportation_index, coefficient_matrix([{("船舶", sign_id): 1, **{(product_id, sign_id): -ratio for product_id, ratio in ship_load.items()}} for sign_id in sign]), "G")
+    # sign_idのplusとminusでflowが不変
+    sign_matrix = coefficient_matrix([{(product_id, "plus"): 1, (product_id, "minus"): -1} for product_id in num_product_list])
+    add_rows(transportation_index, sign_matrix, "E")
+    add_rows(storage_index, sign_matrix, "E")
+    # B行列（functionごとの変換行列を行数をそろえて重ね、各エッジのfunctionの行列を取り出す）
+    max_bom_rows = max(len(rows) for rows in bom_rows.values())
+    bom_tensor = np.stack([coefficient_matrix(bom_rows[function] + [{}] * (max_bom_rows - len(bom_rows[function]))) for function in function_list])
+    add_rows(production_index, bom_tensor[[edge.function_code for edge in production_list]].reshape(len(production_list), max_bom_rows, num_slot), "E")
+
+    # Mass Balance（接続行列）: 行 = ノード × 部材（船舶以外）
+    # plusのフローは流出元ノードに+1、minusのフローは流出先ノードに-1
+    node_index = {node.node_id: index for index, node in enumerate(node_list)}
+    source_index = np.array([node_index[edge.source.node_id] for edge in edge_list])
+    target_index = np.array([node_index[edge.target.node_id] for edge in edge_list])
+    num_balance_product = len(num_product_list) - 1
+    balance = product_of_slot[col_slot] < num_balance_product
+    is_plus = sign_of_slot[col_slot] == plus
+    balance_key = np.where(is_plus, source_index[col_edge], target_index[col_edge]) * num_balance_product + product_of_slot[col_slot]
+    supply = np.array([[node.calc_supply_demand[product_id] for product_id in num_product_list[:-1]] for node in node_list], dtype=float).ravel()
+    # 変数を含む行と、変数がなくても満たされない行（需要に対して流入エッジがない等）を残す
+    used = np.zeros(len(supply), dtype=bool)
+    used[balance_key[balance]] = True
+    used |= supply < 0
+    balance_row = np.cumsum(used) - 1 + len(row_sense)
+    entry_rows.append(balance_row[balance_key[balance]])
+    entry_cols.append(np.nonzero(balance)[0])
+    entry_vals.append(np.where(is_plus[balance], 1.0, -1.0))
+    row_sense.extend(["L"] * int(used.sum()))
+    row_rhs.extend(supply[used])
+
+    # 目的関数は行番号-1として同じ三つ組に入れる（すべての列が1回は現れるように係数0も含める）
+    num_col = len(col_ub)
+    rows = np.concatenate([np.full(num_col, -1)] + entry_rows)
+    cols = np.concatenate([np.arange(num_col)] + entry_cols)
+    vals = np.concatenate([col_cost] + entry_vals)
+    row_rhs = np.array(row_rhs, dtype=float)
+
+    # MPSファイルを書き出し（列ごとにまとめる必要があるので列 → 行の順に並べ替え）
+    # 読み込んだ後の変数の並び（上限1の変数はバイナリ変数として先頭に並べ替えられる等）には頼らず、変数名 x<列の番号> で戻す
+    order = np.lexsort((rows, cols))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    lines = ["NAME sample", "ROWS", " N obj"]
+    lines += [f" {sense} r{index}" for index, sense in enumerate(row_sense)]
+    # 整数変数はMARKERで囲む（囲まない場合は連続変数）
+    columns = [f" x{j} {'obj' if i < 0 else f'r{i}'} {v!r}" for i, j, v in zip(rows.tolist(), cols.tolist(), vals.tolist())]
+    if vtype == 'I':
+        columns = [" MARKER 'MARKER' 'INTORG'"] + columns + [" MARKER 'MARKER' 'INTEND'"]
+    lines += ["COLUMNS"] + columns + ["RHS"]
+    lines += [f" RHS r{index} {rhs!r}" for index, rhs in enumerate(row_rhs.tolist()) if rhs != 0]
+    lines += ["BOUNDS"]
+    lines += [f" UP BND x{j} {ub!r}" if ub < math.inf else f" PL BND x{j}" for j, ub in enumerate(col_ub.tolist())]
+    lines += ["ENDATA"]
+
+    fd, path = tempfile.mkstemp(suffix=".mps")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        model.readProblem(path)
+    finally:
+        os.remove(path)
+
+    # 読み込んだ変数を名前でエッジのflowに戻す（以降の結果取得・描画はbuild_modelと同じ）
+    variables = {var.name: var for var in model.getVars()}
+    if len(variables) != len(col_ub):
+        raise RuntimeError(f"MPSファイルから読み込んだ変数の数が合いません: {len(variables)} / {len(col_ub)}")
+    for j, (e, slot) in enumerate(zip(col_edge.tolist(), col_slot.tolist())):
+        edge_list[e].flow.vars[slot] = variables[f"x{j}"]
+
+
+# node_listから計画期間を取得（まとめた設置海域ノードは除く）
+def horizon_of(node_list):
+    return list(dict.fromkeys(node.month for node in node_list if node.month != aggregate_month))
+
+
+# ローリングホライズン（relax-and-fix）で解く
+# 窓ごとに、まだ固定していない期間だけのモデルを作って解く（窓のwindow期間は整数、それより後の期間は連続緩和）
+# 先頭のstep期間の決定を固定して窓をずらす
+# 固定した期間の変数はモデルから外す。そこから入ってくる仮置・輸送のフロー（次の月への仮置在庫、まとめた設置海域ノードへの設置済みの風車）は、
+# 流入先ノードの供給量の定数として引き継ぐ。窓が進むほどモデルは小さくなる
+# 窓より後の期間は外せない。風車の需要は全期間をまとめた設置海域ノードにあるため、外すと窓の中だけで需要を満たすことになり解けなくなる
+# 全期間を固定したら、modelの変数を固定した値にして解く（optimizeと同じく結果はmodel・エッジのflowから取り出せる）
+# 途中の窓が解けなかった場合はmodelを解かずにFalseを返す
+def solve_rolling(model, node_list, edge_lists, horizon, window, step, builder="object", params=None, progress=None):
+    period_index = {month: index for index, month in enumerate(horizon)}
+    # 固定した値 {id(エッジ): 部材 × 符号 の位置ごとの値}
+    fixed = {}
+    start = 0
+    while True:
+        end = min(start + window, len(horizon))
+        # 固定していない期間のノード（まとめた設置海域ノードは常に含む）、需給量は固定した期間からの流入を足すのでコピーする
+        window_nodes = {}
+        for node in node_list:
+            if node.month == aggregate_month or period_index[node.month] >= start:
+                window_node = copy.copy(node)
+                window_node.calc_supply_demand = ProductValues()
+                window_node.calc_supply_demand.values = list(node.calc_supply_demand.values)
+                window_nodes[node.node_id] = window_node
+        for edge_list in edge_lists:
+            for edge in edge_list:
+                values = fixed.get(id(edge))
+                if values is not None and edge.target.node_id in window_nodes:
+                    supply_demand = window_nodes[edge.target.node_id].calc_supply_demand
+                    for product in range(len(num_product_list) - 1):
+                        supply_demand.values[product] += values[slot_of(product, MINUS)]
+        window_lists = [[edge for edge in edge_list if period_index[edge.source.month] >= start] for edge_list in edge_lists]
+
+        # 窓のモデルの変数はエッジのflowに入るので、modelの変数を退避しておく
+        flows = [(edge, edge.flow) for edge_list in window_lists for edge in edge_list]
+        for edge, flow in flows:
+            edge.flow = FlowVars(edge)
+        try:
+            window_model = create_model(list(window_nodes.values()), *window_lists, builder=builder, params=params)
+            for edge_list in window_lists:
+                for edge in edge_list:
+                    if period_index[edge.source.month] >= end:
+                        for var in edge.flow.values():
+                            window_model.chgVarType(var, 'C')
+            if progress:
+                window_model.data = {}
+                set_progress(window_model, progress)
+            window_model.optimize()
+            if window_model.getStatus() != "optimal":
+                return False
+            # 先頭のstep期間（最後の窓は全期間）の値を固定
+            last = len(horizon) if end == len(horizon) else start + step
+            for edge_list in window_lists:
+                for edge in edge_list:
+                    if period_index[edge.source.month] < last:
+                        fixed[id(edge)] = [0 if var is None else round(window_model.getVal(var)) for var in edge.flow.vars]
+        finally:
+            for edge, flow in flows:
+                edge.flow = flow
+        if end == len(horizon):
+            break
+        start += step
+
+    for edge_list in edge_lists:
+        for edge in edge_list:
+            for var, value in zip(edge.flow.vars, fixed[id(edge)]):
+                if var is not None:
+                    model.chgVarLb(var, value)
+                    model.chgVarUb(var, value)
+    model.optimize()
+    return model.getStatus() == "optimal"
+
+
+# 丸めヒューリスティック（RENS）
+# LP解の切り捨て〜切り上げの範囲に変数を制限し、整数に戻して解き直す
+# 整数解が見つからない場合はLP緩和に戻して解き直し、Falseを返す
+def round_relaxation(model, edge_lists):
+    variables = [var for edge_list in edge_lists for edge in edge_list for var in edge.flow.values()]
+    values = [model.getVal(var) for var in variables]
+    upper = [var.getUbOriginal() for var in variables]
+    model.freeTransform()
+    for var, value in zip(variables, values):
+        model.chgVarLb(var, math.floor(value + 1e-6))
+        model.chgVarUb(var, math.ceil(value - 1e-6))
+        model.chgVarType(var, 'I')
     model.optimize()
+    if model.getStatus() == "optimal":
+        return True
 
-    # フラット辞書
-    transportation_results = {}
-    production_results = {}
-    storage_results = {}
+    model.freeTransform()
+    for var, ub in zip(variables, upper):
+        model.chgVarType(var, 'C')
+        model.chgVarLb(var, 0)
+        model.chgVarUb(var, ub)
+    model.optimize()
+    return False
+
+
+# 求解中の進捗を通知するイベントハンドラ
+# 解の更新時と、ノードの処理ごと（interval秒に1回まで）にcallback(phase, primal=, dual=, nodes=)を呼ぶ
+class ProgressEventhdlr(Eventhdlr):
+    events = SCIP_EVENTTYPE.BESTSOLFOUND | SCIP_EVENTTYPE.NODESOLVED
+
+    def __init__(self, interval=0.5):
+        self.callback = None
+        self.interval = interval
+        self.last = 0.0
+
+    def eventinit(self):
+        self.model.catchEvent(self.events, self)
+
+    def eventexit(self):
+        self.model.dropEvent(self.events, self)
+
+    def eventexec(self, event):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if event.getType() != SCIP_EVENTTYPE.BESTSOLFOUND and now - self.last < self.interval:
+            return
+        self.last = now
+        # 解が見つかっていない場合などの無限大はNone
+        primal = self.model.getPrimalbound()
+        dual = self.model.getDualbound()
+        self.callback("presolve" if self.model.getStage() == SCIP_STAGE.PRESOLVING else "B&B",
+                      primal=primal if abs(primal) < self.model.infinity() else None,
+                      dual=dual if abs(dual) < self.model.infinity() else None,
+                      nodes=self.model.getNNodes())
+
+
+# 進捗の通知先を設定（Noneで通知しない）、イベントハンドラはモデルごとに1つ
+def set_progress(model, progress):
+    handler = model.data.get("progress_handler")
+    if handler is None and progress is not None:
+        handler = ProgressEventhdlr()
+        model.includeEventhdlr(handler, "progress", "求解中の進捗を通知")
+        model.data["progress_handler"] = handler
+    if handler is not None:
+        handler.callback = progress
+
+
+# ネットワークからモデルを作成（解かない）
+# builder="matrix" の場合はNumPyの行列からまとめてモデルを作成する
+# mode="preview" の場合は全フローを連続変数にする
+def create_model(node_list, transportation_list, production_list, storage_list, builder="object", mode="exact", params=None):
+    if mode not in ("exact", "preview"):
+        raise ValueError(f"modeは'exact'か'preview'を指定してください: {mode}")
+    # 問題設定
+    model: Model = Model('sample')
+    model.hideOutput()
+    if params:
+        model.setParams(params)
+
+    # モデル作成（previewの場合は連続変数）
+    vtype = 'C' if mode == "preview" else 'I'
+    if builder == "object":
+        build_model(model, node_list, transportation_list, production_list, storage_list, vtype)
+    elif builder == "matrix":
+        build_model_matrix(model, node_list, transportation_list, production_list, storage_list, vtype)
+    else:
+        raise ValueError(f"builderは'object'か'matrix'を指定してください: {builder}")
 
-    if model.getStatus() == "optimal":
-        print("最適化が完了しました。")
-        # 輸送エッジ
-        for transportation_edge in transportation_list:
-            for product_id in num_product_list:
-                for sign_id in sign:
-                    var_name = f'transportation_{transportation_edge.source.node_id}_{transportation_edge.target.node_id}_{transportation_edge.function}_{product_id}_{sign_id}'
-                    var = transportation_edge.flow[transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, sign_id]
-                    value = model.getVal(var)
-                    if value >= 0.1 and sign_id == "minus" and product_id != "船舶":
-                        transportation_results[var_name] = value
-
-        # 製作エッジ
-        for production_edge in production_list:
-            for product_id in num_product_list:
-                for sign_id in sign:
-                    var_name = f'production_{production_edge.source.node_id}_{production_edge.target.node_id}_{production_edge.function}_{product_id}_{sign_id}'
-                    var = production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, product_id, sign_id]
-                    value = model.getVal(var)
-                    if value >= 0.1 and sign_id == "minus":
-                        production_results[var_name] = value
-
-        # 仮置エッジ
-        for storage_edge in storage_list:
-            for product_id in num_product_list:
-                for sign_id in sign:
-                    var_name = f'storage_{storage_edge.source.node_id}_{storage_edge.target.node_id}_{storage_edge.function}_{product_id}_{sign_id}'
-                    var = storage_edge.flow[storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, product_id, sign_id]
-                    value = model.getVal(var)
-                    if value >= 0.1 and sign_id == "minus":
-                        storage_results[var_name] = value
+    # キャパシティを変数の上限にしたことで、presolveがplus/minusの等式や需給制約を多重集約して密な行を作り遅くなるため無効化
+    model.setBoolParam('presolving/donotmultaggr', True)
+    return model
+
+
+# csvからネットワークとモデルを作成（解かない）、optimizeとexport.pyの書き出しで同じモデルを作る
+# horizonは計画期間のリスト（make_horizonで作成、Noneの場合はlayer_network_list）
+# builder・modeはcreate_modelと同じ
+def build_problem(node_rows, edge_rows, builder="object", horizon=None, mode="exact", progress=None, params=None):
+    # csvからネットワークを作成
+    if progress:
+        progress("parsing")
+    node_list, transportation_list, production_list, storage_list = build_network(node_rows, edge_rows, horizon)
+    set_calc_parameters(node_list, transportation_list, production_list, storage_list)
 
+    if progress:
+        progress("building")
+    model = create_model(node_list, transportation_list, production_list, storage_list, builder, mode, params)
+    return node_list, transportation_list, production_list, storage_list, model
 
+
+# 実行関数
+# builder・horizon・modeはbuild_problemと同じ
+# windowを指定するとwindow期間ずつのローリングホライズンで解く（stepは1回で固定する期間数）
+# mode="preview" の場合はLP緩和を解く（rounding=Trueで整数解に丸める）
+# 目的関数の下界をmodel.data["bound"]に入れる
+# progressを指定すると各段階（parsing, building, presolve, B&B）でprogress(phase, **情報)を呼ぶ
+# paramsはSCIPのパラメータの辞書（例: {"lp/threads": 1, "limits/time": 60}）
+def optimize(node_rows, edge_rows, builder="object", horizon=None, window=None, step=1, mode="exact", rounding=False, progress=None, params=None):
+    if mode == "preview" and window is not None:
+        raise ValueError("previewとローリングホライズン（window）は同時に指定できません")
+    # csvの読み込み・モデルの作成の前に確認する
+    if window is not None and not 1 <= step <= window:
+        raise ValueError(f"windowは1以上、stepは1以上window以下で指定してください: window={window}, step={step}")
+    node_list, transportation_list, production_list, storage_list, model = build_problem(node_rows, edge_rows, builder, horizon, mode, progress, params)
+
+    # 最適化
+    # 下界・丸めの結果と、resolveで作り直す場合の引数
+    model.data = {"mode": mode, "bound": None, "rounded": False,
+                  "options": {"builder": builder, "horizon": horizon, "window": window, "step": step, "mode": mode, "rounding": rounding, "params": params}}
+    set_progress(model, progress)
+    if progress:
+        progress("presolve")
+    if window is not None:
+        # ローリングホライズンの解からは全体の下界は得られない
+        solve_rolling(model, node_list, [transportation_list, production_list, storage_list], horizon_of(node_list), window, step, builder, params, progress)
+    elif mode == "preview":
+        model.optimize()
+        if model.getStatus() == "optimal":
+            # LP緩和の最適値は整数解の下界
+            model.data["bound"] = model.getObjVal()
+            if rounding:
+                model.data["rounded"] = round_relaxation(model, [transportation_list, production_list, storage_list])
+    else:
+        model.optimize()
+        if model.getStatus() == "optimal":
+            model.data["bound"] = model.getDualbound()
+
+    if model.getStatus() == "optimal":
+        print("最適化が完了しました。")
         return node_list, \
                transportation_list, \
                production_list, \
                storage_list, \
                model
 
-# 描画関数
-def build_maps(node_list, transportation_list, production_list, storage_list, model):
-    # 各月の地図とnetworkx結果を入れるファイル作成
-    maps_by_month = {}
-    # 月毎にHTMLファイルを作成
-    for month in layer_network_list:
+# 差分で再計算（コスト・キャパシティだけが変わった場合）
+# 前回のoptimizeの戻り値のモデルを使い回し、目的関数の係数と変数の上限だけを変えて、前回の解を初期解として解き直す
+# 作られる変数や需給量が変わる場合、ローリングホライズン・丸めの結果の場合はoptimizeで作り直す
+# 作り直す場合はprogress("rebuilding")、差分で解き直す場合はprogress("diff", costs=目的関数の係数の変更数, bounds=変数の上限の変更数)を呼ぶ
+# 最適解が得られない場合はNone（optimizeと同じ）
+def resolve(previous, node_rows, edge_rows, progress=None):
+    old_node_list, old_transportation_list, old_production_list, old_storage_list, model = previous
+    options = model.data["options"]
+    # 作り直す場合にもう一度読めるようにしておく
+    if not isinstance(node_rows, str):
+        node_rows = list(node_rows)
+    if not isinstance(edge_rows, str):
+        edge_rows = list(edge_rows)
+
+    if progress:
+        progress("parsing")
+    node_list, transportation_list, production_list, storage_list = build_network(node_rows, edge_rows, options["horizon"])
+    set_calc_parameters(node_list, transportation_list, production_list, storage_list)
+    old_edge_list = old_transportation_list + old_production_list + old_storage_list
+    edge_list = transportation_list + production_list + storage_list
+
+    # 同じ変数・制約のモデルになるか確認
+    reusable = options["window"] is None and not options["rounding"] and len(node_list) == len(old_node_list) and len(edge_list) == len(old_edge_list)
+    if reusable:
+        for node, old_node in zip(node_list, old_node_list):
+            if node.node_id != old_node.node_id or node.calc_supply_demand != old_node.calc_supply_demand:
+                reusable = False
+                break
+    if reusable:
+        for edge, old_edge in zip(edge_list, old_edge_list):
+            if (edge.source.node_id, edge.target.node_id, edge.function) != (old_edge.source.node_id, old_edge.target.node_id, old_edge.function) \
+                    or [var is not None for var in old_edge.flow.vars] != [flow_capacity(edge, product, sign_code) != 0 for product in range(len(num_product_list)) for sign_code in range(len(sign))]:
+                reusable = False
+                break
+    if not reusable:
+        if progress:
+            progress("rebuilding")
+        return optimize(node_rows, edge_rows, **options, progress=progress)
+
+    # 変わった上限と目的関数の係数を取り出す
+    bound_changes = []
+    num_cost = 0
+    for edge, old_edge in zip(edge_list, old_edge_list):
+        for product, sign_code, var in old_edge.flow.entries():
+            calc_capacity = flow_capacity(edge, product, sign_code)
+            ub = model.infinity() if calc_capacity is None else calc_capacity
+            if ub != var.getUbOriginal():
+                bound_changes.append((var, ub))
+            if sign_code == MINUS and edge.calc_cost.at(product) != old_edge.calc_cost.at(product):
+                num_cost += 1
+        # 変数はそのまま新しいエッジに付け替える
+        edge.flow = old_edge.flow
+        edge.flow.edge = edge
+    if progress:
+        progress("diff", costs=num_cost, bounds=len(bound_changes))
+
+    # 差分がなければ解き直さない
+    if not bound_changes and not num_cost and model.getStatus() == "optimal":
+        return node_list, transportation_list, production_list, storage_list, model
+
+    # 前回の解（初期解に使う）
+    values = {}
+    if model.getStatus() == "optimal":
+        values = {var.name: model.getVal(var) for edge in edge_list for var in edge.flow.values()}
+    model.freeTransform()
+    for var, ub in bound_changes:
+        model.chgVarUb(var, ub)
+    if num_cost:
+        set_objective(model, transportation_list, production_list, storage_list)
+
+    # 前回の解を初期解として渡す（SCIPが前回の解を保持している場合は重複として無視される）
+    # 上限を下回った変数がある場合は、収まる変数だけの部分解にして残りはSCIPに補完させる
+    if values:
+        variables = [var for edge in edge_list for var in edge.flow.values()]
+        fits = [values[var.name] <= var.getUbOriginal() + 1e-6 for var in variables]
+        sol = model.createSol() if all(fits) else model.createPartialSol()
+        for var, fit in zip(variables, fits):
+            if fit:
+                model.setSolVal(sol, var, values[var.name])
+        model.addSol(sol)
+
+    set_progress(model, progress)
+    if progress:
+        progress("presolve")
+    model.optimize()
+    if model.getStatus() != "optimal":
+        return None
+    model.data["bound"] = model.getObjVal() if options["mode"] == "preview" else model.getDualbound()
+    return node_list, \
+           transportation_list, \
+           production_list, \
+           storage_list, \
+           model
+
+
+# 地図用のネットワーク図を月ごとに作成（地図の描画はrender_mapで表示する月だけ行う）
+def map_graphs(node_list, table):
+    # 各月のnetworkx結果を入れるファイル作成
+    graphs = {}
+    # 計画期間はnode_listの並び順から取得
+    horizon = horizon_of(node_list)
+    # 地図に使う量は全ての月・ノード・エッジ分をまとめて集計（minusのフローの合計）
+    minus = table.equals("sign", "minus")
+    # 製作: (月, ノード, 機能, 部材) → 量
+    production = group_sum(table, ["month", "source", "function", "product"], minus & table.equals("kind", "production"))
+    # 仮置: (月, ノード, 部材) → 量
+    storage = group_sum(table, ["month", "source", "product"], minus & table.equals("kind", "storage"))
+    # 輸送: (月, 始点, 終点, 部材) → 量
+    transportation = group_sum(table, ["month", "source", "target", "product"], minus & table.equals("kind", "transportation"))
+    # 月ごとの輸送エッジ（結果表に現れた順）
+    edges_by_month = {month: {} for month in horizon}
+    for month, source, target, product_id in transportation:
+        edges_by_month[month][(source, target)] = None
+    # 月毎にネットワーク図を作成
+    for month in horizon:
         # NetworkX でネットワーク図作成
         G = nx.DiGraph()
         # -------------------------------------------------
         # 1) ノード情報追加
         for node in node_list:
             if node.month == month:
-                G.add_node(node.name)
-                G.nodes[node.name]["pos"] = [node.lat, node.lon]
                 # ノード名、
                 G.add_node(node.name)
                 # 色々な属性を追加
                 # 緯度経度
                 G.nodes[node.name]["pos"] = [node.lat, node.lon]
                 # モジュール製作〜浮体基礎製作
-                G.nodes[node.name]["浮体生産量"] = int(model.getVal(quicksum(production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "浮体基礎", "minus"] for production_edge in production_list if production_edge.source.node_id == node.node_id and (production_edge.function == "浮体基礎製作" or production_edge.function == "洋上での浮体基礎製作"))))
+                G.nodes[node.name]["浮体生産量"] = int(production.get((month, node.name, "浮体基礎製作", "浮体基礎"), 0) + production.get((month, node.name, "洋上での浮体基礎製作", "浮体基礎"), 0))
                 # 仮置数
-                G.nodes[node.name]["仮置数"] = int(model.getVal(quicksum(storage_edge.flow[storage_edge.source.node_id, storage_edge.target.node_id, storage_edge.function, "浮体基礎", "minus"] for storage_edge in storage_list if storage_edge.source.node_id == node.node_id)))
+                G.nodes[node.name]["仮置数"] = int(storage.get((month, node.name, "浮体基礎"), 0))
                 # 風車組立数
-                G.nodes[node.name]["風車組立数"] = int(model.getVal(quicksum(production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車", "minus"] for production_edge in production_list if production_edge.source.node_id == node.node_id and production_edge.function == "風車組立")))
+                G.nodes[node.name]["風車組立数"] = int(production.get((month, node.name, "風車組立", "風車"), 0))
                 # 風車設置数
-                G.nodes[node.name]["風車設置数"] = int(model.getVal(quicksum(production_edge.flow[production_edge.source.node_id, production_edge.target.node_id, production_edge.function, "風車（設置済）", "minus"] for production_edge in production_list if production_edge.source.node_id == node.node_id and production_edge.function == "風車設置")))
-            else:
-                pass
+                G.nodes[node.name]["風車設置数"] = int(production.get((month, node.name, "風車設置", "風車（設置済）"), 0))
         # -------------------------------------------------
         # 2) エッジ情報追加
-        # エッジリストから情報をとる（各月の）
-        for edge in transportation_list:
-            if edge.month == month:
-                # エッジの始点、終点
-                G.add_edge(edge.source.name, edge.target.name)
-                # リンクに各部品がどれだけ輸送されたかの属性を追加
-                for product_id in num_product_list:
-                    G.edges[edge.source.name, edge.target.name][product_id] = int(model.getVal(quicksum(transportation_edge.flow[transportation_edge.source.node_id, transportation_edge.target.node_id, transportation_edge.function, product_id, "minus"] for transportation_edge in transportation_list if transportation_edge.source.node_id == edge.source.node_id and transportation_edge.target.node_id == edge.target.node_id)))
-            else:
-                pass
-        # -------------------------------------------------
-        # 3) Folium 地図を作成
-        m = folium.Map(location=[35.681236, 139.767125], zoom_start=6, tiles='CartoDB Positron', attr='CartoDB Positron')
-        # -------------------------------------------------
-        # 4) エッジ情報の描画 (常時表示ツールチップ)
-        for u, v, data in G.edges(data=True):
-            # 輸送量がすべて0なら描画しない
-            if all(data.get(product_id, 0) == 0 for product_id in num_product_list):
-                continue
-
-            # エッジの描画（輸送された時のみ）
-            edge_polyline = folium.PolyLine(
-                locations=[G.nodes[u]["pos"], G.nodes[v]["pos"]],
-                color='blue',
-                weight=3
-            )
-            # 常時表示のTooltipを追加
-            edge_polyline.add_to(m)
-        # -------------------------------------------------
-        # 5) ノード情報の描画 (CircleMarker + Marker)
-        for node_name in G.nodes():
-            lat, lon = G.nodes[node_name]['pos']
-
-            # ① 円の描画
-            circle = folium.CircleMarker(
-                location=[lat, lon],
-                radius=15,
-                color=None,
-                fill=True,
-                fill_color='red',
-                fill_opacity=1,
-                tooltip=node_name
-            )
-            circle.add_to(m)
-
-
-            # ② テキストの描画
-            display_name = node_name[:-1] # 最後の1文字を表示させない
-            char_size = 10
-            text_len = len(display_name)
-            icon_w = char_size * text_len   # 幅
-            icon_h = char_size * 1.2        # 高さ（行間考慮で少し増やす）
-            
-            marker = folium.Marker(
+        for source, target in edges_by_month[month]:
+            # エッジの始点、終点
+            G.add_edge(source, target)
+            # リンクに各部品がどれだけ輸送されたかの属性を追加
+            for product_id in num_product_list:
+                G.edges[source, target][product_id] = int(transportation.get((month, source, target, product_id), 0))
+        graphs[month] = G
+    return graphs
+
+
+# 1か月分のネットワーク図から地図を作成してHTML文字列を返す
+def render_map(G):
+    # -------------------------------------------------
+    # 3) Folium 地図を作成
+    m = folium.Map(location=[35.681236, 139.767125], zoom_start=6, tiles='CartoDB Positron', attr='CartoDB Positron')
+    # -------------------------------------------------
+    # 4) エッジ情報の描画 (常時表示ツールチップ)
+    for u, v, data in G.edges(data=True):
+        # 輸送量がすべて0なら描画しない
+        if all(data.get(product_id, 0) == 0 for product_id in num_product_list):
+            continue
+
+        # エッジの描画（輸送された時のみ）
+        edge_polyline = folium.PolyLine(
+            locations=[G.nodes[u]["pos"], G.nodes[v]["pos"]],
+            color='blue',
+            weight=3
+        )
+        # 常時表示のTooltipを追加
+        edge_polyline.add_to(m)
+    # -------------------------------------------------
+    # 5) ノード情報の描画 (CircleMarker + Marker)
+    for node_name in G.nodes():
+        lat, lon = G.nodes[node_name]['pos']
+
+        # ① 円の描画
+        circle = folium.CircleMarker(
             location=[lat, lon],
-            icon=folium.DivIcon(
-                icon_size=(icon_w, icon_h),
-                icon_anchor=(icon_w/2, icon_h/2),
-                html=f"""
-                <div style="
-                    width: {icon_w}px;
-                    height: {icon_h}px;
-                    line-height: {icon_h}px;
-                    text-align: center;
-                    font-family: monospace;
-                    font-size: {char_size}px;
-                    font-weight: bold;
-                    color: white;
-                    ">
-                    {display_name}
-                </div>
-                """
-            )
-            )
-            marker.add_to(m)
-            # ノードのみ時に触れた際にも情報表示
-            Tooltip(node_name, 
-                    permanent=False,   # ホバー時のみ表示
-                    sticky=True       # マウスに追随
-                ).add_to(marker) 
-           
-        # -------------------------------------------------
-        # 6) 不要な枠線の除去 & フォントサイズ修正 (任意)
-        css = """
-        <style>
-            .leaflet-interactive:focus {
-                outline: none !important;
-            }
-            .leaflet-tooltip {
-                font-size: 10px !important;
+            radius=15,
+            color=None,
+            fill=True,
+            fill_color='red',
+            fill_opacity=1,
+            tooltip=node_name
+        )
+        circle.add_to(m)
+
+
+        # ② テキストの描画
+        display_name = node_name[:-1] # 最後の1文字を表示させない
+        char_size = 10
+        text_len = len(display_name)
+        icon_w = char_size * text_len   # 幅
+        icon_h = char_size * 1.2        # 高さ（行間考慮で少し増やす）
+        
+        marker = folium.Marker(
+        location=[lat, lon],
+        icon=folium.DivIcon(
+            icon_size=(icon_w, icon_h),
+            icon_anchor=(icon_w/2, icon_h/2),
+            html=f"""
+            <div style="
+                width: {icon_w}px;
+                height: {icon_h}px;
+                line-height: {icon_h}px;
+                text-align: center;
+                font-family: monospace;
+                font-size: {char_size}px;
                 font-weight: bold;
-            }
-        </style>
-        """
-        m.get_root().html.add_child(folium.Element(css))
-
-        # 生成したマップを HTML 文字列として取得
-        maps_by_month[month] = m._repr_html_()
-
-    return maps_by_month
+                color: white;
+                ">
+                {display_name}
+            </div>
+            """
+        )
+        )
+        marker.add_to(m)
+        # ノードのみ時に触れた際にも情報表示
+        Tooltip(node_name, 
+                permanent=False,   # ホバー時のみ表示
+                sticky=True       # マウスに追随
+            ).add_to(marker) 
+       
+    # -------------------------------------------------
+    # 6) 不要な枠線の除去 & フォントサイズ修正 (任意)
+    css = """
+    <style>
+        .leaflet-interactive:focus {
+            outline: none !important;
+        }
+        .leaflet-tooltip {
+            font-size: 10px !important;
+            font-weight: bold;
+        }
+    </style>
+    """
+    m.get_root().html.add_child(folium.Element(css))
+
+    # 生成したマップを HTML 文字列として取得
+    return m._repr_html_()
+
+
+# 描画関数（全ての月の地図をまとめて作成）
+def build_maps(node_list, transportation_list, production_list, storage_list, model):
+    table = result_table(model, transportation_list, production_list, storage_list)
+    return {month: render_map(G) for month, G in map_graphs(node_list, table).items()}
 
 """
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+# export.py
+# モデルの書き出し: optimizeと同じモデル（解く前）をMPS/LPファイルに書き出し、他のソルバーやSCIPのコマンドラインで解けるようにする
+# 外部で解いた解のファイルを読み込み、同じcsvから作ったモデルの解としてエッジごとの結果（結果表・コストの内訳）に戻す
+#
+# 使い方:
+#   python export.py node.csv edge.csv model.mps [--mode preview] [--builder matrix]
+#   scip -c "set load model.set read model.mps opt write solution model.sol quit"
+#   python export.py node.csv edge.csv model.mps --solution model.sol [--out result.csv]
+#
+# 書き出すファイル（model.mps の場合）:
+#   model.mps      モデル（拡張子が .lp の場合はLP形式）
+#   model.names.csv 変数名 → エッジ・部材・符号の対応表
+#   model.set      SCIPのパラメータ（optimizeで変えているもの）
+# 変数名は x<番号>、制約名は c<番号>（SCIPのモデルでの変数・制約の並び順の番号）で、同じcsv・オプションからは常に同じ名前になる
+import argparse
+import csv
+import os
+import re
+import sys
+
+from calc import aggregate_month, build_problem, cost_breakdown, result_table, result_columns, num_product_list, sign
+from scenario import format_table
+
+# 書き出せる形式（拡張子）
+export_formats = [".mps", ".lp"]
+# 解のファイルの変数名
+variable_pattern = re.compile(r"x\d+")
+
+
+# 書き出したファイルでの変数名 → 変数
+# SCIPの番号付きの名前（genericnames）と同じく、番号はmodel.getVars()の並び順（バイナリ変数が先）
+def generic_variables(model):
+    return {f"x{position}": var for position, var in enumerate(model.getVars())}
+
+
+# 対応表・パラメータのファイルのパス（モデルのファイルの拡張子を置き換える）
+def sidecar_paths(path):
+    stem = os.path.splitext(path)[0]
+    return stem + ".names.csv", stem + ".set"
+
+
+# モデルをMPS/LPファイルに書き出し、変数名の対応表とSCIPのパラメータも書き出す
+# 書き出したファイルのパスのリストを返す
+def export_model(model, transportation_list, production_list, storage_list, path):
+    if os.path.splitext(path)[1].lower() not in export_formats:
+        raise ValueError(f"拡張子は{'、'.join(export_formats)}のどれかを指定してください: {path}")
+    names_path, params_path = sidecar_paths(path)
+    # 日本語・括弧を含む変数名・制約名は使わず、番号付きの名前で書き出す
+    model.writeProblem(path, genericnames=True, verbose=False)
+    model.writeParams(params_path, comments=False, onlychanged=True, verbose=False)
+
+    names = {var.getIndex(): name for name, var in generic_variables(model).items()}
+    with open(names_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name"] + result_columns[:-1])
+        for kind, edge_list in (("transportation", transportation_list), ("production", production_list), ("storage", storage_list)):
+            for edge in edge_list:
+                # まとめた設置海域ノードへのエッジはresult_tableと同じくaggregate
+                edge_kind = "aggregate" if edge.target.month == aggregate_month else kind
+                for product, sign_code, var in edge.flow.entries():
+                    writer.writerow([names[var.getIndex()], edge_kind, edge.source.name, edge.target.name, edge.source.month, edge.function, num_product_list[product], sign[sign_code]])
+    return [path, names_path, params_path]
+
+
+# 解のファイル → {変数名: 値}
+# 各行の x<番号> とその次の数値を読む（SCIP・Gurobi・CBC・HiGHSの解のファイル）、値が0の変数は省略されていてもよい
+def read_solution(path):
+    values = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            tokens = line.split()
+            for name, value in zip(tokens, tokens[1:]):
+                if variable_pattern.fullmatch(name):
+                    try:
+                        values[name] = float(value)
+                    except ValueError:
+                        continue
+                    break
+    return values
+
+
+# 解のファイルを読み込み、モデルの解（Solution）にする
+# モデルはbuild_problemで同じcsv・オプションから作ったもの（解く前）
+# 制約を満たさない場合、モデルにない変数がある場合はValueError
+def load_solution(model, path):
+    values = read_solution(path)
+    if not values:
+        raise ValueError(f"解のファイルに変数の値がありません: {path}")
+    variables = generic_variables(model)
+    unknown = [name for name in values if name not in variables]
+    if unknown:
+        raise ValueError(f"モデルにない変数があります（{len(unknown)}件、例: {unknown[0]}）。同じcsv・オプション（builder・mode）で書き出したモデルの解か確認してください")
+    sol = model.createSol()
+    for name, var in variables.items():
+        model.setSolVal(sol, var, values.get(name, 0.0))
+    if not model.checkSol(sol, printreason=False, original=True):
+        raise ValueError("解が制約を満たしません。同じcsv・オプション（builder・mode）で書き出したモデルの解か確認してください")
+    return sol
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="モデルをMPS/LPファイルに書き出す、外部で解いた解を読み込む")
+    parser.add_argument("node_csv")
+    parser.add_argument("edge_csv")
+    parser.add_argument("model_file", help="書き出すモデルのファイル（.mps / .lp）")
+    parser.add_argument("--builder", default="object", choices=["object", "matrix"])
+    parser.add_argument("--mode", default="exact", choices=["exact", "preview"], help="exact: 整数変数、preview: 連続変数（LP緩和）")
+    parser.add_argument("--solution", help="読み込む解のファイル（指定しない場合はモデルを書き出す）")
+    parser.add_argument("--out", help="解の結果表を書き出すcsvファイル")
+    args = parser.parse_args(argv)
+
+    node_list, transportation_list, production_list, storage_list, model = build_problem(args.node_csv, args.edge_csv, builder=args.builder, mode=args.mode)
+    if args.solution is None:
+        for path in export_model(model, transportation_list, production_list, storage_list, args.model_file):
+            print(f"書き出しました: {path}")
+        print(f"変数 {model.getNVars()}, 制約 {model.getNConss()}")
+        return 0
+
+    sol = load_solution(model, args.solution)
+    breakdown = cost_breakdown(model, transportation_list, production_list, storage_list, sol)
+    print(format_table([{
+        "objective": model.getSolObjVal(sol),
+        "transportation_cost": breakdown["transportation"],
+        "production_cost": breakdown["production"],
+        "storage_cost": breakdown["storage"]
+    }], ["objective", "transportation_cost", "production_cost", "storage_cost"]))
+    if args.out:
+        table = result_table(model, transportation_list, production_list, storage_list, sol)
+        with open(args.out, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(result_columns)
+            writer.writerows(zip(*(table[name].tolist() for name in result_columns)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# jobs.py
+# 最適化の非同期ジョブ
+# 計算はプロセスプールで実行し、各段階の進捗はジョブIDごとに共有辞書で受け渡す
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from calc import map_graphs, optimize, resolve, result_table, node_results
+
+# 同時に計算するジョブ数（環境変数で変更可能）
+MAX_WORKERS = int(os.environ.get('SOLVE_WORKERS', os.cpu_count() or 1))
+# 終了したジョブの状態を残しておく時間[秒]
+JOB_TTL = 3600
+# 結果（entry）の形式を変えたら上げる（キャッシュのキーに含める）
+RESULT_VERSION = 4
+
+# 進捗の表示名
+PHASE_LABELS = {
+    'queued': '順番待ち',
+    'parsing': 'csv読み込み',
+    'rebuilding': 'モデルの作り直し（構造が変わったため）',
+    'diff': '前回のモデルに差分を反映',
+    'building': 'モデル作成',
+    'presolve': '前処理（presolve）',
+    'B&B': '分枝限定法（B&B）',
+    'rendering': '地図データ作成',
+    'done': '完了',
+    'failed': 'エラー'
+}
+
+# 親プロセス側の状態
+_context = multiprocessing.get_context('spawn')
+_lock = threading.Lock()
+_executor = None
+_manager = None
+_progress = None
+jobs = {}
+# 計算中のジョブ（同じcsv・設定のジョブは1つだけ実行する）
+inflight = {}
+
+# ワーカープロセス側の直前の結果（同じ設定ならresolveで差分だけ再計算）
+_previous = None
+
+
+# ワーカープロセスで実行: 最適化 → 結果表 → 地図用のネットワーク図作成（地図の描画は表示するときに行う）
+def solve(job_id, node_text, edge_text, horizon, calc_mode, progress_store):
+    global _previous
+
+    def progress(phase, **info):
+        progress_store[job_id] = {'phase': phase, **info}
+
+    # 計算モード（exact: 整数で厳密に解く、preview: LP緩和、preview_round: LP緩和を整数に丸める）
+    mode = 'exact' if calc_mode == 'exact' else 'preview'
+    rounding = (calc_mode == 'preview_round')
+
+    # 前回と同じ設定の場合は前回のモデルを使い回して差分だけ再計算
+    previous = _previous
+    _previous = None
+    if previous and previous[-1].data['options'] == {**previous[-1].data['options'], 'horizon': horizon, 'mode': mode, 'rounding': rounding}:
+        result = resolve(previous, node_text.splitlines(True), edge_text.splitlines(True), progress=progress)
+    else:
+        result = optimize(node_text.splitlines(True), edge_text.splitlines(True), horizon=horizon, mode=mode, rounding=rounding, progress=progress)
+    if result is None:
+        raise RuntimeError('最適解が見つかりませんでした（需要を満たせない・キャパシティ不足などを確認してください）')
+    node_list, transportation_list, production_list, storage_list, model = result
+
+    # 全変数の値を1回で取り出した結果表から、表示用の結果を作成
+    table = result_table(model, transportation_list, production_list, storage_list)
+    # 生産結果・仮置結果（ノード&月ごと）
+    production_results = node_results(table, 'production')
+    storage_results = node_results(table, 'storage')
+
+    progress('rendering')
+    graphs = map_graphs(node_list, table)
+
+    # 画面表示に使う結果と結果表
+    entry = {
+        'display': {
+            'months': list(graphs),
+            'map_graphs': graphs,
+            'node_list': node_list,
+            'production_results': production_results,
+            'storage_results': storage_results,
+            # 目的関数値と下界（previewの場合は真の最適値がこの範囲にある）
+            'summary': {
+                'mode': calc_mode,
+                'objective': model.getObjVal(),
+                'bound': model.data['bound'],
+                'rounded': model.data['rounded']
+            },
+            # 初期表示月を先頭に
+            'active_month': next(iter(graphs))
+        },
+        'table': table
+    }
+    # 進捗の通知先は親プロセスの共有辞書なので、次のジョブで使い回す前に外す
+    progress_handler = model.data.get('progress_handler')
+    if progress_handler is not None:
+        progress_handler.callback = None
+    _previous = result
+    return entry
+
+
+# プロセスプールと共有辞書は最初のジョブで作成
+def _start():
+    global _executor, _manager, _progress
+    if _executor is None:
+        _manager = _context.Manager()
+        _progress = _manager.dict()
+        _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=_context)
+
+
+# ジョブを登録してジョブIDを返す
+# keyが同じジョブが計算中の場合はそのジョブIDを返す、on_done(entry)は計算が終わったときに親プロセスで呼ばれる
+def submit(key, node_text, edge_text, horizon, calc_mode, on_done=None):
+    with _lock:
+        _start()
+        _prune()
+        if key in inflight:
+            return inflight[key]
+        job_id = uuid.uuid4().hex
+        jobs[job_id] = {'key': key, 'submitted': time.time(), 'finished': None, 'error': None}
+        inflight[key] = job_id
+        future = _executor.submit(solve, job_id, node_text, edge_text, horizon, calc_mode, _progress)
+        jobs[job_id]['future'] = future
+
+    def finish(future):
+        job = jobs[job_id]
+        try:
+            entry = future.result()
+            if on_done is not None:
+                on_done(entry)
+        except Exception as e:
+            job['error'] = str(e) or type(e).__name__
+        with _lock:
+            job['finished'] = time.time()
+            inflight.pop(key, None)
+            _progress.pop(job_id, None)
+
+    future.add_done_callback(finish)
+    return job_id
+
+
+# ジョブの状態（ないジョブIDの場合はNone）
+# state: queued / running / done / failed、phaseと求解中の上界(primal)・下界(dual)は進捗の共有辞書から取得
+def status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return None
+    if job['finished'] is not None:
+        state = 'failed' if job['error'] else 'done'
+        info = {'phase': state}
+    else:
+        info = dict(_progress.get(job_id, {'phase': 'queued'}))
+        state = 'queued' if info['phase'] == 'queued' else 'running'
+    return {
+        'job_id': job_id,
+        'state': state,
+        'phase': info['phase'],
+        'phase_label': PHASE_LABELS.get(info['phase'], info['phase']),
+        'primal': info.get('primal'),
+        'dual': info.get('dual'),
+        'nodes': info.get('nodes'),
+        'elapsed': round((job['finished'] or time.time()) - job['submitted'], 1),
+        'error': job['error']
+    }
+
+
+# 終了してからJOB_TTL秒たったジョブの状態を削除
+def _prune():
+    now = time.time()
+    for job_id in [job_id for job_id, job in jobs.items() if job['finished'] is not None and now - job['finished'] > JOB_TTL]:
+        jobs.pop(job_id)
+        _progress.pop(job_id, None)
@@ -1,19 +1,44 @@
 # sample.py
-from flask import Flask, request, render_template, redirect, url_for
+from flask import Flask, request, render_template, redirect, url_for, jsonify, session
 import io
-from calc import build_maps, optimize, num_product_list, sign
+from calc import make_horizon, render_map
+import cache
+import jobs
+from store import ResultStore
 
 app = Flask(__name__)
 app.secret_key = '十分ランダムな文字列'
 
-# グローバルキャッシュ
-GLOBAL_CACHE = {
-    'maps_by_month': None,
-    'node_list': None,
-    'active_month': None,
-    'production_results': None,
-    'storage_results': None
-}
+# 計算結果の保存先（セッションには結果のキーだけを持たせる）
+result_store = ResultStore()
+
+# 1か月分の地図のHTML（表示するときに描画し、結果の保存先にメモしておく）
+def month_map(result_key, display, month):
+    map_key = f"{result_key}_map_{display['months'].index(month)}"
+    html = result_store.get(map_key)
+    if html is None:
+        html = render_map(display['map_graphs'][month])
+        result_store.put(map_key, html)
+    return html
+
+# フォームの計画期間（期間数が未入力の場合はNone = 既定の12か月）
+# 整数でない・範囲外の場合はValueError
+def form_horizon(form):
+    if not form.get('num_periods'):
+        return None
+    values = []
+    for name, label in (('start_year', '開始年'), ('start_month', '開始月'), ('num_periods', '期間数')):
+        try:
+            values.append(int(form.get(name, '')))
+        except ValueError:
+            raise ValueError(f"{label}は整数で入力してください: {form.get(name, '')!r}") from None
+    return make_horizon(*values)
+
+# セッションの結果（ない場合はNone）
+def session_result():
+    result_key = session.get('result_key')
+    entry = result_store.get(result_key) if result_key else None
+    return result_key, entry
 
 @app.route('/', methods=['GET'])
 def index():
@@ -23,91 +48,90 @@ def index():
 def show():
     if request.method == 'POST':
         # POST: ファイル受け取り → 最適化 → キャッシュ
-        node_stream = io.TextIOWrapper(request.files['node_file'].stream, encoding='utf-8-sig')
-        edge_stream = io.TextIOWrapper(request.files['edge_file'].stream, encoding='utf-8-sig')
-
-        node_list, transportation_list, production_list, storage_list, model = optimize(node_stream, edge_stream)
-
-        # 生産結果表示プログラム
-        production_results = {}
-        for pe in production_list:
-            month = pe.source.month
-            node = pe.source.name
-            # key=ノード&月のセット
-            key = (month, node)
-            # このキーのリストがなければ新規作成
-            production_results.setdefault(key, [])
-            for product_id in num_product_list:
-                for sign_id in sign:
-                    var = pe.flow[
-                        (pe.source.node_id,
-                        pe.target.node_id,
-                        pe.function,
-                        product_id,
-                        sign_id)
-                    ]
-                    val = model.getVal(var)
-                    # minus のフロー（＝生産量の実数値）だけ取る
-                    if sign_id == 'minus' and val >= 0.1:
-                        # value=値
-                        production_results[key].append(
-                            (pe.function, val)
-                        )
-        
-        # 仮置結果表示プログラム
-        storage_results = {}
-        for pe in storage_list:            
-            month = pe.source.month
-            node = pe.source.name
-            # key=ノード&月のセット
-            key = (month, node)
-            # このキーのリストがなければ新規作成
-            storage_results.setdefault(key, [])
-            for product_id in num_product_list:
-                for sign_id in sign:
-                    var = pe.flow[
-                        (pe.source.node_id,
-                        pe.target.node_id,
-                        pe.function,
-                        product_id,
-                        sign_id)
-                    ]
-                    val = model.getVal(var)
-                    # minus のフロー（＝生産量の実数値）だけ取る
-                    if sign_id == 'minus' and val >= 0.1:
-                        # value=値
-                        storage_results[key].append(
-                            (pe.function, val)
-                        )
-
-
-        maps_by_month = build_maps(node_list, transportation_list, production_list, storage_list, model)
-
-        # グローバルキャッシュに保存
-        GLOBAL_CACHE['maps_by_month'] = maps_by_month
-        GLOBAL_CACHE['node_list'] = node_list
-        GLOBAL_CACHE['production_results'] = production_results
-        GLOBAL_CACHE['storage_results'] = storage_results
-        # 初期表示月を先頭に
-        GLOBAL_CACHE['active_month'] = next(iter(maps_by_month.keys()))
-        return redirect(url_for('show'))
-
-    # GET: キャッシュから読み出し → タブ切り替えの ?month=XX を受け取って active_month 更新
-    maps_by_month = GLOBAL_CACHE['maps_by_month']
-    node_list      = GLOBAL_CACHE['node_list'] or []
-    production_results = GLOBAL_CACHE['production_results'] or {}
-    storage_results = GLOBAL_CACHE['storage_results'] or {}
-    active_month   = request.args.get('month', GLOBAL_CACHE['active_month'])
+        node_text = io.TextIOWrapper(request.files['node_file'].stream, encoding='utf-8-sig').read()
+        edge_text = io.TextIOWrapper(request.files['edge_file'].stream, encoding='utf-8-sig').read()
+
+        # 計画期間（期間数が未入力の場合は既定の12か月）
+        # 誤りがある場合は計算せずに入力画面に表示する
+        try:
+            horizon = form_horizon(request.form)
+        except ValueError as e:
+            return render_template('index.html', form_error=f"計画期間の指定に誤りがあります：{e}"), 400
+
+        # 計算モード（exact: 整数で厳密に解く、preview: LP緩和、preview_round: LP緩和を整数に丸める）
+        calc_mode = request.form.get('calc_mode', 'exact')
 
+        # このセッションで表示する結果のキー（csv・設定のハッシュ）
+        result_key = cache.cache_key(node_text, edge_text, {'horizon': horizon, 'mode': calc_mode, 'version': jobs.RESULT_VERSION})
+        session['result_key'] = result_key
+
+        # 同じcsv・設定の計算結果があれば最適化を行わない
+        if result_store.get(result_key) is not None:
+            return redirect(url_for('show'))
+
+        # 計算はジョブとしてプロセスプールで実行し、進捗画面に移る
+        # 終わったら結果の保存先に入れる
+        job_id = jobs.submit(result_key, node_text, edge_text, horizon, calc_mode, lambda entry: result_store.put(result_key, entry))
+        return redirect(url_for('show', job=job_id))
+
+    # GET: セッションの結果を読み出し → タブ切り替えの ?month=XX を受け取って active_month 更新
+    result_key, entry = session_result()
+    display = entry['display'] if entry else {}
+    months = display.get('months') or []
+    node_list      = display.get('node_list') or []
+    production_results = display.get('production_results') or {}
+    storage_results = display.get('storage_results') or {}
+    active_month   = request.args.get('month', display.get('active_month'))
+    if active_month not in months:
+        active_month = display.get('active_month')
+    # 表示する月の地図だけ描画
+    active_map = month_map(result_key, display, active_month) if months else None
+    summary = display.get('summary')
+    # 計算中のジョブ（?job=XX またはセッションの結果を計算中の場合は進捗を表示して完了まで待つ）
+    job_id = request.args.get('job') or (jobs.inflight.get(result_key) if entry is None else None)
+    job = jobs.status(job_id) if job_id else None
+    # 結果が有効期限切れ・上限サイズで削除された場合
+    expired = bool(result_key) and entry is None and job is None
 
     return render_template(
         'index.html',
-        maps_by_month=maps_by_month,
+        months=months,
+        active_map=active_map,
         node_list=node_list,
         production_results = production_results,
         storage_results = storage_results,
-        active_month=active_month
+        active_month=active_month,
+        summary=summary,
+        job=job,
+        expired=expired
     )
 
+# タブ切り替え用: 1か月分の地図とノード一覧だけをJSONで返す
+@app.route('/months/<month>', methods=['GET'])
+def month_fragment(month):
+    result_key, entry = session_result()
+    if entry is None or month not in entry['display']['months']:
+        return jsonify({'error': '結果が見つかりません'}), 404
+    display = entry['display']
+    return jsonify({
+        'month': month,
+        'map': month_map(result_key, display, month),
+        'info': render_template(
+            'node_info.html',
+            node_list=[node for node in display['node_list'] if node.month == month],
+            production_results=display['production_results'],
+            storage_results=display['storage_results'],
+            active_month=month
+        )
+    })
+
+# ジョブの状態（進捗画面から定期的に取得）
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'ジョブが見つかりません'}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     app.run(debug=True, port=8000)
\ No newline at end of file
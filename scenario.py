@@ -0,0 +1,190 @@
+# scenario.py
+# シナリオ比較: 基準のノード・エッジcsvに変更（上書き）を加えた複数のケースを並列に解き、結果を表にまとめる
+#
+# 使い方:
+#   python scenario.py node.csv edge.csv scenarios.json [--workers 4] [--threads 1] [--out result.csv]
+#
+# scenarios.json の例:
+#   [
+#     {"name": "基準"},
+#     {"name": "津2仮置なし", "node": [{"place": "津2", "column": "仮置[True/False]", "value": "FALSE"}]},
+#     {"name": "船舶2倍", "edge": [{"column": "船舶の容量[隻]", "scale": 2}]},
+#     {"name": "設置開始5月", "node": [{"kind": "設置海域", "column": "何月から浮体基礎を設置できるか", "value": "5"}]},
+#     {"name": "プレビュー", "options": {"mode": "preview"}}
+#   ]
+# 変更は "node" / "edge" ごとのリストで、対象の行を
+#   place（ノードの場所）、kind（ノードの種類）、source / target（エッジの流出元・流出先）
+# で絞り込み（指定しない場合は全行）、column の列を value に置き換えるか scale 倍する
+# 列はcsvの見出しで探すので、csvの列の順番が変わっても同じ列を変更する
+# column は見出し（末尾の（）内の注記は除いて比べる）、スキーマの項目名（install_start など）、
+# スキーマ（schema.pyのnode_schema / edge_schema）での番号のどれか
+# "options" はoptimizeの引数（mode, horizon, window など）
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from calc import csv_rows, optimize, cost_breakdown
+from schema import edge_schema, header_name, node_schema
+
+# 比較表の列
+table_columns = ["name", "status", "objective", "transportation_cost", "production_cost", "storage_cost", "bound", "solve_time", "total_time", "error"]
+
+# ワーカープロセスが持つ基準のcsv（最初に1回だけ受け取る）
+_base_node_rows = None
+_base_edge_rows = None
+
+
+def _init_worker(node_rows, edge_rows):
+    global _base_node_rows, _base_edge_rows
+    _base_node_rows = node_rows
+    _base_edge_rows = edge_rows
+
+
+# 絞り込みのキー → スキーマの項目名
+node_selectors = {"place": "name", "kind": "kind"}
+edge_selectors = {"source": "source", "target": "target"}
+
+
+# 見出し・スキーマの項目名・スキーマでの番号 → csvでの列番号
+def column_index(header, schema, column):
+    if isinstance(column, int):
+        if not 0 <= column < len(schema):
+            raise ValueError(f"列番号はスキーマの列の数（{len(schema)}）未満で指定してください: {column}")
+        column = schema[column][1]
+    else:
+        column = header_name(column)
+        column = next((heading for key, heading, _, _ in schema if key == column), column)
+    names = [header_name(cell) for cell in header]
+    if column in names:
+        return names.index(column)
+    raise ValueError(f"列が見つかりません: {column}")
+
+
+# 基準の行に変更を加えた行を返す（基準の行は変更しない）
+# selectorsは絞り込みのキー → スキーマの項目名
+def apply_overrides(rows, overrides, schema, selectors):
+    rows = [row[:] for row in rows]
+    header = rows[0] if rows else []
+    if not overrides:
+        return rows
+    # 場所・sourceの列（空欄の行は飛ばす）と絞り込みの列
+    key_position = column_index(header, schema, schema[0][0])
+    selector_positions = {selector: column_index(header, schema, key) for selector, key in selectors.items()}
+    for override in overrides:
+        index = column_index(header, schema, override["column"])
+        matched = 0
+        for row in rows[1:]:
+            if key_position >= len(row) or not row[key_position].strip():
+                continue
+            if any(selector in override and row[position].strip() != override[selector] for selector, position in selector_positions.items()):
+                continue
+            if "value" in override:
+                row[index] = str(override["value"])
+            elif "scale" in override:
+                number = float(row[index]) * override["scale"] if row[index].strip() else 0
+                row[index] = str(int(number)) if float(number).is_integer() else str(number)
+            else:
+                raise ValueError(f"valueかscaleを指定してください: {override}")
+            matched += 1
+        if matched == 0:
+            raise ValueError(f"変更の対象となる行がありません: {override}")
+    return rows
+
+
+# ワーカープロセスで実行: 1ケース分の変更 → 最適化 → 結果の1行
+def run_scenario(scenario, threads):
+    start = time.time()
+    result_row = {"name": scenario["name"], "status": None, "error": None}
+    try:
+        node_rows = apply_overrides(_base_node_rows, scenario.get("node", []), node_schema, node_selectors)
+        edge_rows = apply_overrides(_base_edge_rows, scenario.get("edge", []), edge_schema, edge_selectors)
+        # 同時に解くケース同士でCPUを取り合わないようにSCIPのスレッド数を制限
+        params = {"lp/threads": threads, "parallel/maxnthreads": threads, **scenario.get("options", {}).get("params", {})}
+        options = {key: value for key, value in scenario.get("options", {}).items() if key != "params"}
+        result = optimize(node_rows, edge_rows, params=params, **options)
+        if result is None:
+            result_row["status"] = "infeasible"
+        else:
+            node_list, transportation_list, production_list, storage_list, model = result
+            breakdown = cost_breakdown(model, transportation_list, production_list, storage_list)
+            result_row.update({
+                "status": model.getStatus(),
+                "objective": model.getObjVal(),
+                "transportation_cost": breakdown["transportation"],
+                "production_cost": breakdown["production"],
+                "storage_cost": breakdown["storage"],
+                "bound": model.data["bound"],
+                "solve_time": model.getSolvingTime()
+            })
+    except Exception as e:
+        result_row["status"] = "error"
+        result_row["error"] = str(e) or type(e).__name__
+    result_row["total_time"] = time.time() - start
+    return result_row
+
+
+# シナリオをまとめて解き、比較表（辞書のリスト、シナリオの順）を返す
+# node_source / edge_source はcsvのパスか読み込み済みの行、基準のcsvは1回だけ読み込んで各ワーカーに渡す
+def run_scenarios(node_source, edge_source, scenarios, workers=None, threads=1):
+    node_rows = csv_rows(node_source)
+    edge_rows = csv_rows(edge_source)
+    names = [scenario["name"] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("シナリオ名が重複しています")
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(node_rows, edge_rows)) as executor:
+        return list(executor.map(run_scenario, scenarios, [threads] * len(scenarios)))
+
+
+# 表示幅（全角文字は2）
+def display_width(text):
+    return sum(2 if unicodedata.east_asian_width(char) in "WF" else 1 for char in text)
+
+
+# 比較表を表示用の文字列に
+def format_table(rows, columns=table_columns):
+    def cell(row, column):
+        value = row.get(column)
+        if value is None:
+            return ""
+        if column.endswith("_time"):
+            return f"{value:.2f}"
+        if isinstance(value, float):
+            return f"{value:,.0f}"
+        return str(value)
+    cells = [columns] + [[cell(row, column) for column in columns] for row in rows]
+    widths = [max(display_width(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join("  ".join(value + " " * (width - display_width(value)) for value, width in zip(line, widths)).rstrip() for line in cells)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シナリオ比較（基準のcsvに変更を加えたケースを並列に解く）")
+    parser.add_argument("node_csv")
+    parser.add_argument("edge_csv")
+    parser.add_argument("scenarios", help="シナリオのjsonファイル")
+    parser.add_argument("--workers", type=int, default=None, help="同時に解くケース数（既定: CPU数 / threads）")
+    parser.add_argument("--threads", type=int, default=1, help="1ケースあたりのSCIPのスレッド数")
+    parser.add_argument("--out", help="比較表を書き出すcsvファイル")
+    args = parser.parse_args(argv)
+
+    with open(args.scenarios, encoding="utf-8") as f:
+        scenarios = json.load(f)
+    rows = run_scenarios(args.node_csv, args.edge_csv, scenarios, workers=args.workers, threads=args.threads)
+    print(format_table(rows))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=table_columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0 if all(row["status"] != "error" for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# schema.py
+# ノード・エッジcsvの読み込みと入力チェック
+# 列は見出しの名前で探し（列の順番は問わない）、各行を1回だけ型変換して軽いレコード（namedtuple）にする
+# ファイルは1行ずつ読むので全体をメモリに載せない、誤りは全て集めてからモデル作成の前にまとめて報告する
+import csv
+import itertools
+import re
+from collections import defaultdict, namedtuple
+
+# 製作・組立・設置の機能（node.csvのコスト・キャパシティの列の順）
+production_tasks = ["モジュール製作", "ハーフボディ1製作", "ハーフボディ3製作", "浮体基礎製作", "洋上での浮体基礎製作", "風車組立", "風車設置"]
+# ノードの種類
+node_kinds = ["小型造船所", "中型造船所", "大型造船所", "基地港湾", "設置海域", "なし（仮置のみ）"]
+
+NodeRecord = namedtuple("NodeRecord", ["line", "name", "lat", "lon", "kind", "storage", "storage_cost", "storage_capacity", "offshore_foundation", "task_cost", "task_capacity", "steel", "turbine", "install_start"])
+EdgeRecord = namedtuple("EdgeRecord", ["line", "source", "target", "distance", "ship_capacity"])
+
+
+# csvの誤り（errorsは (ファイル, 行, 列, 内容) のリスト）
+class CsvError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [f"{label} {line}行目" + (f" {column}" if column else "") + f": {message}" for label, line, column, message in errors]
+        super().__init__(f"csvの内容に誤りがあります（{len(errors)}件）\n" + "\n".join(lines))
+
+    # プロセスプールから親プロセスに渡せるように（pickle）
+    def __reduce__(self):
+        return CsvError, (self.errors,)
+
+
+# 風車設置を開始できる期間の番号
+# csvの値が "5" のように月だけの場合は、計画期間の中で最初に5月になる期間
+def start_period_index(value, horizon):
+    value = value.strip()
+    for index, period in enumerate(horizon):
+        if value and (period == value or period == f"{value}月" or period.endswith(f"年{value}月")):
+            return index
+    raise ValueError(f"風車設置の開始月が計画期間にありません: {value!r}（計画期間: {horizon[0]}〜{horizon[-1]}）")
+
+
+# 各列の型変換（空欄は None、変換できない場合は ValueError）
+def text(value):
+    return value or None
+
+
+def number(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"数値ではありません: {value!r}")
+
+
+def integer(value):
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"整数ではありません: {value!r}")
+
+
+def flag(value):
+    if not value:
+        return False
+    if value.upper() not in ("TRUE", "FALSE"):
+        raise ValueError(f"TRUEかFALSEを指定してください: {value!r}")
+    return value.upper() == "TRUE"
+
+
+# 列の定義: (項目, 見出し, 型変換, 必須か)
+# 見出しは末尾の（）内の注記を除いて比べる、同じ見出しが複数ある場合は最初の列
+node_schema = [
+    ("name", "場所", text, True),
+    ("lat", "緯度", number, True),
+    ("lon", "経度", number, True),
+    ("kind", "種類", text, True),
+    ("storage", "仮置[True/False]", flag, False),
+    ("storage_cost", "仮置コスト[円]", number, False),
+    ("storage_capacity", "仮置数[基]", integer, False),
+    ("offshore_foundation", "洋上での浮体基礎製作[True/False]", flag, False),
+    *[(f"{task}コスト", f"{task}コスト[円]", number, False) for task in production_tasks],
+    *[(f"{task}キャパシティ", f"{task}キャパシティ[基]", number, False) for task in production_tasks[:-2]],
+    ("風車組立キャパシティ", "風車組立キャパシティ[基・風車]", number, False),
+    ("風車設置キャパシティ", "風車設置キャパシティ[基・風車]", integer, False),
+    ("steel", "鋼材供給量[基/4]", integer, False),
+    ("turbine", "風車需要量[基]", integer, False),
+    ("install_start", "何月から浮体基礎を設置できるか", text, False)
+]
+edge_schema = [
+    ("source", "source", text, True),
+    ("target", "target", text, True),
+    ("distance", "2点間距離[km]", integer, True),
+    ("ship_capacity", "船舶の容量[隻]", integer, True)
+]
+
+
+# csvを1行ずつ返す
+# ファイルのパス、行の文字列（TextIOWrapperなど）、読み込み済みの行（List[List[str]]）のどれでも受け取る
+def iter_rows(source):
+    if isinstance(source, str):
+        with open(source, encoding="utf-8-sig", newline="") as f:
+            yield from csv.reader(f)
+        return
+    rows = iter(source)
+    first = next(rows, None)
+    if first is None:
+        return
+    if isinstance(first, list):
+        yield first
+        yield from rows
+    else:
+        yield from csv.reader(itertools.chain([first], rows))
+
+
+def header_name(cell):
+    return re.sub(r"（[^（]*）$", "", cell.replace("\ufeff", "").strip())
+
+
+# 見出し → 列番号（ない列は誤りに追加してNone）
+def column_positions(header, schema, label, errors):
+    names = [header_name(cell) for cell in header]
+    positions = []
+    for _, column, _, _ in schema:
+        if column in names:
+            positions.append(names.index(column))
+        else:
+            positions.append(None)
+            errors.append((label, 1, column, "列がありません"))
+    return positions
+
+
+# 1行ずつ型変換した値の辞書を返す（スキーマの最初の列（場所・source）が空欄の行は飛ばす）
+# 誤りはerrorsに追加し、その行はvalid=Falseで返す（変換できた値だけ入る）
+def read_rows(source, schema, label, errors):
+    rows = iter_rows(source)
+    header = next(rows, None)
+    if header is None:
+        errors.append((label, 1, None, "ファイルが空です"))
+        return
+    positions = column_positions(header, schema, label, errors)
+    if None in positions:
+        return
+    # 空欄かどうかは見出しから探した列で判定する（列の順番が変わっても同じ）
+    key_position = positions[0]
+    for line, row in enumerate(rows, start=2):
+        if key_position >= len(row) or not row[key_position].strip():
+            continue
+        values = {}
+        valid = True
+        for (key, column, parse, required), position in zip(schema, positions):
+            cell = row[position].strip() if position < len(row) else ""
+            try:
+                values[key] = parse(cell)
+            except ValueError as e:
+                errors.append((label, line, column, str(e)))
+                valid = False
+                continue
+            if required and values[key] is None:
+                errors.append((label, line, column, "空欄です"))
+                valid = False
+        yield line, values, valid
+
+
+# ノードcsv → NodeRecordのリスト、namesには誤りのある行も含めた場所を追加
+def read_nodes(source, horizon, errors, names, label="ノードcsv"):
+    records = []
+    for line, values, valid in read_rows(source, node_schema, label, errors):
+        names[values["name"]].append(line)
+        if values.get("kind") is not None and values["kind"] not in node_kinds:
+            errors.append((label, line, "種類", f"{'、'.join(node_kinds)}のどれかを指定してください: {values['kind']!r}"))
+            valid = False
+        install_start = None
+        if values.get("kind") == "設置海域" and "install_start" in values:
+            try:
+                install_start = start_period_index(values["install_start"] or "", horizon)
+            except ValueError as e:
+                errors.append((label, line, "何月から浮体基礎を設置できるか", str(e)))
+                valid = False
+        if not valid:
+            continue
+        records.append(NodeRecord(
+            line=line,
+            name=values["name"],
+            lat=values["lat"],
+            lon=values["lon"],
+            kind=values["kind"],
+            storage=values["storage"],
+            storage_cost=values["storage_cost"],
+            storage_capacity=values["storage_capacity"],
+            offshore_foundation=values["offshore_foundation"],
+            task_cost=tuple(values[f"{task}コスト"] for task in production_tasks),
+            task_capacity=tuple(values[f"{task}キャパシティ"] for task in production_tasks),
+            steel=values["steel"] or 0,
+            turbine=values["turbine"] or 0,
+            install_start=install_start
+        ))
+    return records
+
+
+# エッジcsv → EdgeRecordのリスト（流出元・流出先はノードcsvにある場所、namesがNoneの場合は確認しない）
+def read_edges(source, names, errors, label="エッジcsv"):
+    records = []
+    for line, values, valid in read_rows(source, edge_schema, label, errors):
+        for key in ("source", "target"):
+            if names is not None and values.get(key) is not None and values[key] not in names:
+                errors.append((label, line, key, f"ノードcsvにない場所です: {values[key]!r}"))
+                valid = False
+        if valid:
+            records.append(EdgeRecord(line, values["source"], values["target"], values["distance"], values["ship_capacity"]))
+    return records
+
+
+# ノード・エッジcsvを読み込んでチェックする、誤りがあれば全てまとめてCsvErrorを投げる
+def read_network(node_source, edge_source, horizon):
+    errors = []
+    # 場所 → 行番号のリスト
+    names = defaultdict(list)
+    node_records = read_nodes(node_source, horizon, errors, names)
+    for name, lines in names.items():
+        if len(lines) > 1:
+            errors.append(("ノードcsv", lines[1], "場所", f"場所が重複しています: {name!r}（{lines[0]}行目）"))
+    # ノードcsvの見出しに誤りがある場合は場所が分からないので、エッジの場所は確認しない
+    if any(line == 1 for _, line, _, _ in errors):
+        names = None
+    edge_records = read_edges(edge_source, names, errors)
+    if errors:
+        raise CsvError(errors)
+    return node_records, edge_records
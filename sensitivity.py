@@ -0,0 +1,92 @@
+# sensitivity.py
+# 感度分析: 船舶の傭船料の倍率を変えたときの総コスト・コストの内訳の変化
+# モデルは1回だけ作り、各点では目的関数の係数（輸送エッジの船舶のコスト）だけを変えて解き直す
+#
+# 使い方:
+#   python sensitivity.py node.csv edge.csv [--factors 0.5,0.75,1,1.25,1.5] [--parameters ship_installation_cost,ship_foundation_cost] [--mode preview] [--out result.csv]
+#
+# 結果は1パラメータずつ倍率を変えた行（他のパラメータは1倍）で、先頭は基準（全て1倍）の行
+import argparse
+import csv
+import sys
+import time
+
+from calc import optimize, cost_breakdown, set_objective, set_ship_rates, ship_rate_names
+from scenario import format_table
+
+# 結果の列
+sensitivity_columns = ["parameter", "factor", "status", "objective", "transportation_cost", "production_cost", "storage_cost", "solve_time"]
+
+
+# 解いた結果の1行
+def sensitivity_row(parameter, factor, model, transportation_list, production_list, storage_list):
+    row = {"parameter": parameter, "factor": factor, "status": model.getStatus(), "solve_time": model.getSolvingTime()}
+    if model.getStatus() == "optimal":
+        breakdown = cost_breakdown(model, transportation_list, production_list, storage_list)
+        row.update({
+            "objective": model.getObjVal(),
+            "transportation_cost": breakdown["transportation"],
+            "production_cost": breakdown["production"],
+            "storage_cost": breakdown["storage"]
+        })
+    return row
+
+
+# gridは {パラメータ名: 倍率のリスト}（パラメータ名はship_rate_names）
+# 結果（辞書のリスト）を返す、基準の解が見つからない場合はNone
+def sensitivity(node_rows, edge_rows, grid, horizon=None, mode="exact", params=None):
+    for parameter in grid:
+        if parameter not in ship_rate_names:
+            raise ValueError(f"パラメータは{ship_rate_names}のどれかを指定してください: {parameter}")
+    result = optimize(node_rows, edge_rows, horizon=horizon, mode=mode, params=params)
+    if result is None:
+        return None
+    node_list, transportation_list, production_list, storage_list, model = result
+    rows = [sensitivity_row("基準", 1.0, model, transportation_list, production_list, storage_list)]
+
+    for parameter, factors in grid.items():
+        for factor in factors:
+            # 変数・制約はそのままで、船舶のコストだけを変える
+            # （SCIPは前回までの解を保持しているので、それらが新しい係数で初期解の候補になる）
+            set_ship_rates(transportation_list, {parameter: factor})
+            model.freeTransform()
+            set_objective(model, transportation_list, production_list, storage_list)
+            model.optimize()
+            rows.append(sensitivity_row(parameter, factor, model, transportation_list, production_list, storage_list))
+
+    # モデルの係数を基準に戻しておく
+    set_ship_rates(transportation_list, {})
+    model.freeTransform()
+    set_objective(model, transportation_list, production_list, storage_list)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="感度分析（船舶の単価の倍率を変えて解き直す）")
+    parser.add_argument("node_csv")
+    parser.add_argument("edge_csv")
+    parser.add_argument("--factors", default="0.5,0.75,1.25,1.5", help="倍率（カンマ区切り）")
+    parser.add_argument("--parameters", default=",".join(ship_rate_names), help="変えるパラメータ（カンマ区切り）")
+    parser.add_argument("--mode", default="exact", choices=["exact", "preview"], help="exact: 整数で厳密に解く、preview: LP緩和")
+    parser.add_argument("--out", help="結果を書き出すcsvファイル")
+    args = parser.parse_args(argv)
+
+    factors = [float(factor) for factor in args.factors.split(",")]
+    grid = {parameter: factors for parameter in args.parameters.split(",")}
+    start = time.time()
+    rows = sensitivity(args.node_csv, args.edge_csv, grid, mode=args.mode)
+    if rows is None:
+        print("基準の最適解が見つかりませんでした。")
+        return 1
+    print(format_table([{**row, "factor": f"{row['factor']:g}"} for row in rows], sensitivity_columns))
+    print(f"{len(rows)}点 {time.time() - start:.2f}秒")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=sensitivity_columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
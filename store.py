@@ -0,0 +1,74 @@
+# store.py
+# 計算結果の保存先（セッション・ジョブごと）
+# 結果はcsv・設定のハッシュ（cache.cache_key）ごとに保存し、各セッションはそのキーだけを持つ
+# メモリ上は上限サイズ・有効期限つきのLRU
+# ディスク（cache.pyの計算結果キャッシュ、上限サイズのLRU）を使う場合は複数のプロセスから同じ結果を読める
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import cache
+
+# メモリ上の上限サイズ[バイト]・有効期限[秒]・ディスクを使うか（環境変数で変更可能）
+STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', 256 * 1024 * 1024))
+STORE_TTL = int(os.environ.get('RESULT_STORE_TTL', 3600))
+STORE_DISK = os.environ.get('RESULT_STORE_DISK', '1') != '0'
+
+
+class ResultStore:
+    def __init__(self, max_bytes=STORE_MAX_BYTES, ttl=STORE_TTL, disk=STORE_DISK):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = disk
+        # key → (最後に使われた時刻, サイズ, 結果)、古い順
+        self.entries = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    # 結果を取得（メモリ → ディスクの順、ない場合・有効期限切れの場合はNone）
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            self.expire(now)
+            if key in self.entries:
+                _, size, entry = self.entries.pop(key)
+                self.entries[key] = (now, size, entry)
+                return entry
+        if not self.disk:
+            return None
+        entry = cache.load(key)
+        if entry is not None:
+            self.put(key, entry, disk=False)
+        return entry
+
+    # 結果を保存
+    def put(self, key, entry, disk=True):
+        # サイズはpickleしたときの大きさで見積もる
+        size = len(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            if key in self.entries:
+                self.total -= self.entries.pop(key)[1]
+            # 1件で上限を超える場合はメモリには置かない
+            if size <= self.max_bytes:
+                self.entries[key] = (time.time(), size, entry)
+                self.total += size
+            self.evict()
+        if disk and self.disk:
+            cache.store(key, entry)
+
+    # 有効期限切れを削除
+    def expire(self, now):
+        while self.entries:
+            key, (used, size, _) = next(iter(self.entries.items()))
+            if now - used <= self.ttl:
+                break
+            del self.entries[key]
+            self.total -= size
+
+    # 上限サイズに収まるまで古いものから削除
+    def evict(self):
+        while self.total > self.max_bytes:
+            _, (_, size, _) = self.entries.popitem(last=False)
+            self.total -= size
@@ -0,0 +1,36 @@
+# テストからリポジトリ直下のモジュール（calc.pyなど）を読み込めるようにする
+# 同梱のnode.csv・edge.csvのパスと読み込んだ行は各テストで共通のフィクスチャにする
+import csv
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+
+# 同梱のcsv → 行のリスト（テストごとに読み直すので書き換えてよい）
+def read_csv(name):
+    with open(os.path.join(root, name), encoding="utf-8-sig", newline="") as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def node_csv():
+    return os.path.join(root, "node.csv")
+
+
+@pytest.fixture
+def edge_csv():
+    return os.path.join(root, "edge.csv")
+
+
+@pytest.fixture
+def node_rows():
+    return read_csv("node.csv")
+
+
+@pytest.fixture
+def edge_rows():
+    return read_csv("edge.csv")
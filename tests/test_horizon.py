@@ -0,0 +1,20 @@
+import pytest
+
+from calc import make_horizon, optimize
+
+
+def test_make_horizon_crosses_year():
+    assert make_horizon(2025, 11, 4) == ["2025年11月", "2025年12月", "2026年1月", "2026年2月"]
+
+
+@pytest.mark.parametrize("start_month, num_periods", [(0, 12), (13, 12), (11, 0), (11, -1)])
+def test_make_horizon_rejects_out_of_range(start_month, num_periods):
+    with pytest.raises(ValueError):
+        make_horizon(2025, start_month, num_periods)
+
+
+# csvを読む前に確認する（存在しないファイルでもValueError）
+@pytest.mark.parametrize("window, step", [(0, 1), (3, 0), (3, 4)])
+def test_optimize_rejects_bad_window_before_reading_csv(window, step):
+    with pytest.raises(ValueError, match="window"):
+        optimize("missing_node.csv", "missing_edge.csv", window=window, step=step)
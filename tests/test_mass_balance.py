@@ -0,0 +1,50 @@
+# Mass Balance制約: ノードごとの流出・流入エッジの振り分け（build_model）で作った制約が、
+# 以前の全エッジを走査する方法で作る制約と同じになることを確認する
+from collections import Counter
+
+from calc import build_problem, num_product_list
+
+
+# 制約の1行 → (変数名と係数の組, 左辺, 右辺)
+def row_key(coefficients, lhs, rhs):
+    return frozenset((name, coefficient) for name, coefficient in coefficients.items() if coefficient != 0), lhs, rhs
+
+
+# モデルのMass Balance制約（左辺がない <= の制約）
+def model_rows(model):
+    rows = Counter()
+    for cons in model.getConss():
+        lhs = model.getLhs(cons)
+        if cons.isLinear() and lhs <= -model.infinity():
+            rows[row_key(model.getValsLinear(cons), -model.infinity(), model.getRhs(cons))] += 1
+    return rows
+
+
+# 以前の方法: node_id × 部材ごとに輸送・製作・仮置の全エッジを走査して流出（plus）・流入（minus）の変数を集める
+def full_scan_rows(model, node_list, transportation_list, production_list, storage_list):
+    rows = Counter()
+    for node in node_list:
+        for product_id in num_product_list[:-1]:
+            coefficients = {}
+            for edge_list in (transportation_list, production_list, storage_list):
+                for edge in edge_list:
+                    key = (edge.source.node_id, edge.target.node_id, edge.function, product_id)
+                    if edge.source.node_id == node.node_id and edge.flow.get(key + ("plus",)) is not None:
+                        name = edge.flow[key + ("plus",)].name
+                        coefficients[name] = coefficients.get(name, 0) + 1
+                    if edge.target.node_id == node.node_id and edge.flow.get(key + ("minus",)) is not None:
+                        name = edge.flow[key + ("minus",)].name
+                        coefficients[name] = coefficients.get(name, 0) - 1
+            rhs = node.calc_supply_demand[product_id]
+            # 変数を含まず満たされる制約（0 <= 0など）は作られない
+            if not coefficients and rhs >= 0:
+                continue
+            rows[row_key(coefficients, -model.infinity(), rhs)] += 1
+    return rows
+
+
+def test_mass_balance_matches_full_scan(node_csv, edge_csv):
+    node_list, transportation_list, production_list, storage_list, model = build_problem(node_csv, edge_csv)
+    rows = model_rows(model)
+    assert rows
+    assert rows == full_scan_rows(model, node_list, transportation_list, production_list, storage_list)
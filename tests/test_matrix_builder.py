@@ -0,0 +1,35 @@
+# 行列からまとめて作るモデル（builder="matrix"）が、1本ずつ作るモデル（builder="object"）と
+# 同じ変数（エッジ・部材・符号ごとの上限・種類・目的関数の係数）と制約になることを確認する
+# 変数の並び順は比べず、エッジのflowに戻した変数どうしを比べる
+from collections import Counter
+
+from calc import build_problem
+
+
+# 変数名 → (エッジの番号, 部材 × 符号 の位置)
+def variable_keys(edge_list):
+    return {var.name: (index, slot) for index, edge in enumerate(edge_list) for slot, var in enumerate(edge.flow.vars) if var is not None}
+
+
+def variables(model, edge_list):
+    keys = variable_keys(edge_list)
+    return {keys[var.name]: (var.vtype(), var.getUbOriginal(), var.getObj()) for var in model.getVars()}
+
+
+def constraints(model, edge_list):
+    keys = variable_keys(edge_list)
+    rows = Counter()
+    for cons in model.getConss():
+        coefficients = frozenset((keys[name], coefficient) for name, coefficient in model.getValsLinear(cons).items() if coefficient != 0)
+        rows[coefficients, model.getLhs(cons), model.getRhs(cons)] += 1
+    return rows
+
+
+def test_matrix_builder_matches_object_builder(node_csv, edge_csv):
+    built = {}
+    for builder in ("object", "matrix"):
+        node_list, transportation_list, production_list, storage_list, model = build_problem(node_csv, edge_csv, builder=builder)
+        edge_list = transportation_list + production_list + storage_list
+        built[builder] = variables(model, edge_list), constraints(model, edge_list)
+    assert built["matrix"][0] == built["object"][0]
+    assert built["matrix"][1] == built["object"][1]
@@ -0,0 +1,37 @@
+# シナリオの変更: 列の順番が変わっても見出しで同じ列を変更することを確認する
+import pytest
+
+from scenario import apply_overrides, edge_selectors, node_selectors
+from schema import edge_schema, node_schema
+
+
+# 見出しの値 → その列の値（場所 → 値）
+def column_values(rows, heading, key_heading="場所"):
+    header = [cell.split("（")[0] for cell in rows[0]]
+    return {row[header.index(key_heading)]: row[header.index(heading)] for row in rows[1:] if row[header.index(key_heading)]}
+
+
+@pytest.mark.parametrize("reorder", [False, True])
+def test_node_override_uses_header_names(reorder, node_rows):
+    rows = node_rows
+    if reorder:
+        rows = [row[::-1] for row in rows]
+    overrides = [{"kind": "設置海域", "column": "何月から浮体基礎を設置できるか", "value": "7"},
+                 {"place": "津2", "column": "storage_capacity", "scale": 2}]
+    changed = apply_overrides(rows, overrides, node_schema, node_selectors)
+    assert column_values(changed, "何月から浮体基礎を設置できるか")["能代沖6"] == "7"
+    assert column_values(changed, "仮置数[基]")["津2"] == "12"
+    assert column_values(changed, "仮置数[基]")["舞鶴7"] == "6"
+    # 基準の行は変更しない
+    assert column_values(rows, "仮置数[基]")["津2"] == "6"
+
+
+def test_edge_override_by_schema_number(edge_rows):
+    rows = [row[::-1] for row in edge_rows]
+    changed = apply_overrides(rows, [{"source": "秋田5", "column": 3, "value": "5"}], edge_schema, edge_selectors)
+    assert column_values(changed, "船舶の容量[隻]", "source") == {**column_values(rows, "船舶の容量[隻]", "source"), "秋田5": "5"}
+
+
+def test_unknown_column(node_rows):
+    with pytest.raises(ValueError):
+        apply_overrides(node_rows, [{"column": "ない列", "value": "1"}], node_schema, node_selectors)
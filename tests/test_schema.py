@@ -0,0 +1,33 @@
+# csvの読み込み: 列の順番を変えても同じレコードになることを確認する
+import pytest
+
+from calc import layer_network_list
+from schema import CsvError, read_network
+
+
+# 列を逆順に並べ替える
+def reversed_columns(rows):
+    return [row[::-1] for row in rows]
+
+
+def test_reordered_columns_give_same_records(node_rows, edge_rows):
+    nodes, edges = read_network(node_rows, edge_rows, layer_network_list)
+    reordered_nodes, reordered_edges = read_network(reversed_columns(node_rows), reversed_columns(edge_rows), layer_network_list)
+    assert [node[1:] for node in reordered_nodes] == [node[1:] for node in nodes]
+    assert [edge[1:] for edge in reordered_edges] == [edge[1:] for edge in edges]
+
+
+def test_blank_rows_are_skipped_by_name_column(node_rows, edge_rows):
+    # 最初の列は空欄だが場所がある行は読み込み、場所が空欄で他の列に値がある行は飛ばす
+    node_rows = [["メモ"] + row for row in node_rows]
+    node_rows[1][0] = ""
+    node_rows.append(["メモだけの行"] + [""] * (len(node_rows[0]) - 1))
+    nodes, _ = read_network(node_rows, edge_rows, layer_network_list)
+    assert len(nodes) == 7
+
+
+def test_missing_name_column_is_reported(node_rows, edge_rows):
+    node_rows[0][0] = "名前"
+    with pytest.raises(CsvError) as error:
+        read_network(node_rows, edge_rows, layer_network_list)
+    assert ("ノードcsv", 1, "場所", "列がありません") in error.value.errors